@@ -1,5 +1,5 @@
 import pygame
-from player.animation import Animation
+from gameplay.asset_cache import load_animation, load_frames, load_image
 from characters.character_data import CHARACTERS
 
 
@@ -16,22 +16,16 @@ class CharacterSelect:
         )
 
         # ===== BACKGROUND =====
-        self.bg = pygame.image.load(
-            "assets/Background/Level/Green.png"
-        ).convert()
+        self.bg = load_image(
+            "assets/Background/Level/Green.png", alpha=False
+        )
 
         # ===== UI ASSETS =====
-        self.card_img = pygame.image.load(
-            "assets/Menu/Buttons/UI Border.png"
-        ).convert_alpha()
+        self.card_img = load_image("assets/Menu/Buttons/UI Border.png")
 
-        self.btn_buy = pygame.image.load(
-            "assets/Menu/Buttons/Answer.png"
-        ).convert_alpha()
+        self.btn_buy = load_image("assets/Menu/Buttons/Answer.png")
 
-        self.btn_back = pygame.image.load(
-            "assets/Menu/Buttons/Previous.png"
-        ).convert_alpha()
+        self.btn_back = load_image("assets/Menu/Buttons/Previous.png")
 
         # ===== FONTS =====
         self.title_font = pygame.font.Font(
@@ -54,8 +48,8 @@ class CharacterSelect:
         # ===== LOAD CHARACTER ANIM =====
         self.anims = {}
         for name, info in CHARACTERS.items():
-            self.anims[name] = Animation(
-                pygame.image.load(info["idle"]).convert_alpha(),
+            self.anims[name] = load_animation(
+                info["idle"],
                 32, 32,
                 speed=0.25,
                 loop=True
@@ -66,19 +60,11 @@ class CharacterSelect:
         base = "assets/Items/Fruits"
 
         FRAME_SIZE = 32
-        FRAME_X = 32   # 🔥 offset đúng của frame đầu (quan trọng)
+        FRAME_INDEX = 1   # 🔥 frame thứ 2 (x = 32) mới là frame đầu đúng (quan trọng)
 
         for fruit in self.item_manager.count:
-            sheet = pygame.image.load(
-                f"{base}/{fruit}.png"
-            ).convert_alpha()
-
-            # cắt đúng frame đầu
-            frame = sheet.subsurface(
-                (FRAME_X, 0, FRAME_SIZE, FRAME_SIZE)
-            )
-
-            self.fruit_icons[fruit] = frame
+            frames = load_frames(f"{base}/{fruit}.png", FRAME_SIZE, FRAME_SIZE)
+            self.fruit_icons[fruit] = frames[FRAME_INDEX]
 
 
     # ================= EVENT =================
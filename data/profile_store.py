@@ -0,0 +1,370 @@
+# data/profile_store.py
+#
+# Save nhiều học viên trên 1 máy (phòng lab): mỗi học viên 1 profile trong SQLite (data/profiles.db).
+# - WAL: game ghi trong khi công cụ của giáo viên (python -m data.profile_store ...) vẫn đọc được.
+# - Mỗi bảng có khóa (profile_id, ...) -> tra cứu theo index, đổi profile chỉ đọc dòng của profile đó.
+# - Ghi từng phần: nhặt 1 quả chỉ cập nhật dòng của loại quả đó, không ghi lại cả save.
+# ProfileSaveManager giữ nguyên các hàm của SaveManager nên phần còn lại của game không cần đổi.
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_DB = "data/profiles.db"
+DEFAULT_CHARACTER = "Virtual Guy"
+RUN_HISTORY_KEEP = 200   # số lượt chơi giữ lại cho mỗi profile
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    selected_character TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fruits (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    discovered INTEGER NOT NULL,
+    PRIMARY KEY (profile_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS unlocked_levels (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    level_id INTEGER NOT NULL,
+    PRIMARY KEY (profile_id, level_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS characters (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    PRIMARY KEY (profile_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS best_times (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    level_id INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    PRIMARY KEY (profile_id, level_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    level_id INTEGER NOT NULL,
+    seed INTEGER,
+    ticks INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_profile ON runs (profile_id, level_id, finished_at);
+"""
+
+
+class ProfileStore:
+    """Kết nối SQLite dùng chung cho mọi profile"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # isolation_level=None: tự quản lý transaction (BEGIN/COMMIT) cho từng lần ghi nhỏ
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commit không fsync mỗi lần -> ghi trên game thread vẫn rẻ,
+        # mất điện chỉ có thể mất vài lần ghi cuối, không làm hỏng file
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.execute("PRAGMA busy_timeout=2000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def transaction(self):
+        return _Transaction(self.conn)
+
+    # ================= PROFILES =================
+    def get_profile_id(self, name):
+        row = self.conn.execute("SELECT id FROM profiles WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def create_profile(self, name):
+        now = time.time()
+        with self.transaction():
+            cur = self.conn.execute(
+                "INSERT INTO profiles (name, selected_character, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (name, DEFAULT_CHARACTER, now, now)
+            )
+            profile_id = cur.lastrowid
+            self.conn.execute("INSERT INTO unlocked_levels VALUES (?, 1)", (profile_id,))
+            self.conn.execute("INSERT INTO characters VALUES (?, ?)", (profile_id, DEFAULT_CHARACTER))
+        return profile_id
+
+    def list_profiles(self):
+        """[(tên, lần chơi cuối)] mới nhất trước"""
+        return self.conn.execute("SELECT name, last_used FROM profiles ORDER BY last_used DESC").fetchall()
+
+    def touch(self, profile_id):
+        self.conn.execute("UPDATE profiles SET last_used = ? WHERE id = ?", (time.time(), profile_id))
+
+    # ================= READ (1 profile) =================
+    def load_profile(self, profile_id):
+        """Đọc save của 1 profile, cùng dạng với SaveManager.data"""
+        q = self.conn.execute
+        count, discovered = {}, {}
+        for name, n, seen in q("SELECT name, count, discovered FROM fruits WHERE profile_id = ?", (profile_id,)):
+            count[name] = n
+            discovered[name] = bool(seen)
+
+        unlocked = [r[0] for r in q(
+            "SELECT level_id FROM unlocked_levels WHERE profile_id = ? ORDER BY level_id", (profile_id,))]
+        owned = [r[0] for r in q("SELECT name FROM characters WHERE profile_id = ?", (profile_id,))]
+        selected = q("SELECT selected_character FROM profiles WHERE id = ?", (profile_id,)).fetchone()[0]
+        best = dict(q("SELECT level_id, ticks FROM best_times WHERE profile_id = ?", (profile_id,)).fetchall())
+
+        return {
+            "fruits": {"count": count, "discovered": discovered} if count else {},
+            "levels": {"unlocked": unlocked or [1]},
+            "characters": {"owned": owned or [DEFAULT_CHARACTER], "selected": selected},
+            "best_times": best,
+        }
+
+    def get_runs(self, profile_id, level_id=None, limit=20):
+        """Lượt chơi gần nhất: [(level_id, seed, ticks, completed, finished_at)]"""
+        sql = "SELECT level_id, seed, ticks, completed, finished_at FROM runs WHERE profile_id = ?"
+        params = [profile_id]
+        if level_id is not None:
+            sql += " AND level_id = ?"
+            params.append(level_id)
+        sql += " ORDER BY finished_at DESC LIMIT ?"
+        params.append(limit)
+        return [(lv, seed, ticks, bool(done), at) for lv, seed, ticks, done, at in self.conn.execute(sql, params)]
+
+    # ================= WRITE (từng phần) =================
+    def put_fruits(self, profile_id, rows):
+        """rows: [(tên, số lượng, đã gặp)] -> chỉ các loại quả vừa đổi"""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fruits VALUES (?, ?, ?, ?)",
+                [(profile_id, name, n, int(seen)) for name, n, seen in rows]
+            )
+
+    def add_unlocked_level(self, profile_id, level_id):
+        self.conn.execute("INSERT OR IGNORE INTO unlocked_levels VALUES (?, ?)", (profile_id, level_id))
+
+    def put_best_time(self, profile_id, level_id, ticks):
+        """Giữ số tick ít hơn nếu level đã có thời gian tốt nhất"""
+        self.conn.execute(
+            "INSERT INTO best_times VALUES (?, ?, ?) "
+            "ON CONFLICT (profile_id, level_id) DO UPDATE SET ticks = MIN(ticks, excluded.ticks)",
+            (profile_id, level_id, ticks)
+        )
+
+    def set_characters(self, profile_id, added, removed, selected):
+        with self.transaction():
+            self.conn.executemany("INSERT OR IGNORE INTO characters VALUES (?, ?)",
+                                  [(profile_id, name) for name in added])
+            self.conn.executemany("DELETE FROM characters WHERE profile_id = ? AND name = ?",
+                                  [(profile_id, name) for name in removed])
+            if selected is not None:
+                self.conn.execute("UPDATE profiles SET selected_character = ? WHERE id = ?", (selected, profile_id))
+
+    def add_run(self, profile_id, level_id, seed, ticks, completed):
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO runs (profile_id, level_id, seed, ticks, completed, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (profile_id, level_id, seed, ticks, int(completed), time.time())
+            )
+            if completed:
+                self.put_best_time(profile_id, level_id, ticks)
+            # Chỉ giữ RUN_HISTORY_KEEP lượt mới nhất
+            self.conn.execute(
+                "DELETE FROM runs WHERE profile_id = ? AND id NOT IN "
+                "(SELECT id FROM runs WHERE profile_id = ? ORDER BY finished_at DESC, id DESC LIMIT ?)",
+                (profile_id, profile_id, RUN_HISTORY_KEEP)
+            )
+
+    def import_save(self, profile_id, data):
+        """Chép 1 save dạng JSON (data/save.json cũ) vào profile"""
+        fruits = _fruit_rows(data.get("fruits", {}))
+        chars = data.get("characters", {})
+        # 1 transaction cho cả save: lỗi giữa chừng thì không import gì
+        with self.transaction():
+            self.put_fruits(profile_id, [(name, n, seen) for name, (n, seen) in fruits.items()])
+            for level_id in data.get("levels", {}).get("unlocked", []):
+                self.add_unlocked_level(profile_id, level_id)
+            self.set_characters(profile_id, chars.get("owned", []), (), chars.get("selected"))
+            # Key trong JSON là chuỗi ("3": 250)
+            for level_id, ticks in data.get("best_times", {}).items():
+                self.put_best_time(profile_id, int(level_id), ticks)
+
+
+class _Transaction:
+    """BEGIN/COMMIT; lồng trong 1 transaction đang mở thì gộp vào transaction ngoài"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.outer = False
+
+    def __enter__(self):
+        self.outer = not self.conn.in_transaction
+        if self.outer:
+            self.conn.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.outer:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _fruit_rows(fruits):
+    """Save trái cây (format mới hoặc cũ, xem ItemManager.import_data) -> {tên: (số lượng, đã gặp)}"""
+    if not fruits:
+        return {}
+    if "count" in fruits:
+        seen = fruits.get("discovered", {})
+        return {name: (n, bool(seen.get(name, False))) for name, n in fruits["count"].items()}
+    return {name: (n, n > 0) for name, n in fruits.items()}
+
+
+# ==================================================
+# SAVE MANAGER THEO PROFILE
+# ==================================================
+class ProfileSaveManager:
+    """
+    Cùng các hàm với SaveManager (save_fruits, unlock_level, save_characters...) nhưng lưu vào ProfileStore.
+    self.data vẫn có cùng dạng để đọc nhanh; mỗi hàm ghi chỉ cập nhật đúng phần vừa đổi.
+    """
+
+    def __init__(self, store, profile):
+        self.store = store
+        self.switch_profile(profile)
+
+    def switch_profile(self, profile):
+        """Đổi sang profile khác (tạo mới nếu chưa có); chỉ đọc dữ liệu của profile đó"""
+        profile_id = self.store.get_profile_id(profile)
+        if profile_id is None:
+            profile_id = self.store.create_profile(profile)
+            print(f"[ProfileSaveManager] Tạo profile mới: {profile}")
+        self.profile = profile
+        self.profile_id = profile_id
+        self.store.touch(profile_id)
+
+        self.data = self.store.load_profile(profile_id)
+        # Bản đã ghi xuống DB: so với lần lưu sau để biết dòng nào đổi
+        # (CharacterManager sửa trực tiếp list owned trong self.data nên không so với self.data được)
+        self._fruit_rows = _fruit_rows(self.data["fruits"])
+        self._owned = set(self.data["characters"]["owned"])
+        self._selected = self.data["characters"]["selected"]
+
+    # ================= CORE =================
+    def save(self):
+        """Mọi thay đổi đã được ghi ngay khi gọi hàm lưu tương ứng"""
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.store.close()
+
+    # ================= FRUITS =================
+    def save_fruits(self, fruits):
+        self.data["fruits"] = fruits
+        rows = _fruit_rows(fruits)
+        changed = [(name, n, seen) for name, (n, seen) in rows.items() if self._fruit_rows.get(name) != (n, seen)]
+        if changed:
+            self.store.put_fruits(self.profile_id, changed)
+            self._fruit_rows.update((name, (n, seen)) for name, n, seen in changed)
+
+    def get_fruits(self):
+        return self.data["fruits"]
+
+    # ================= LEVELS =================
+    def unlock_level(self, level_id):
+        unlocked = self.data["levels"]["unlocked"]
+
+        if level_id not in unlocked:
+            unlocked.append(level_id)
+            unlocked.sort()
+            self.store.add_unlocked_level(self.profile_id, level_id)
+
+    def is_level_unlocked(self, level_id):
+        return level_id in self.data["levels"]["unlocked"]
+
+    # ================= CHARACTERS =================
+    def get_owned_characters(self):
+        return self.data["characters"]["owned"]
+
+    def get_selected_character(self):
+        return self.data["characters"]["selected"]
+
+    def save_characters(self, owned, selected):
+        self.data["characters"]["owned"] = owned
+        self.data["characters"]["selected"] = selected
+
+        owned_set = set(owned)
+        added, removed = owned_set - self._owned, self._owned - owned_set
+        new_selected = selected if selected != self._selected else None
+        if added or removed or new_selected is not None:
+            self.store.set_characters(self.profile_id, added, removed, new_selected)
+            self._owned = owned_set
+            self._selected = selected
+
+    # ================= RECORDS =================
+    def record_run(self, level_id, seed, ticks, completed):
+        """1 lượt chơi level: lưu lịch sử, cập nhật thời gian tốt nhất nếu về đích"""
+        self.store.add_run(self.profile_id, level_id, seed, ticks, completed)
+        best = self.data["best_times"]
+        if completed and (level_id not in best or ticks < best[level_id]):
+            best[level_id] = ticks
+
+    def get_best_time(self, level_id):
+        """Số tick ít nhất để qua level, None nếu chưa qua"""
+        return self.data["best_times"].get(level_id)
+
+    def get_runs(self, level_id=None, limit=20):
+        return self.store.get_runs(self.profile_id, level_id, limit)
+
+
+# ==================================================
+# CLI (cho giáo viên)
+# ==================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quản lý profile học viên (data/profiles.db)")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="liệt kê profile")
+    p_import = sub.add_parser("import", help="chép 1 file save.json vào profile")
+    p_import.add_argument("profile")
+    p_import.add_argument("save_json")
+    p_runs = sub.add_parser("runs", help="lượt chơi gần nhất và thời gian tốt nhất của 1 profile")
+    p_runs.add_argument("profile")
+    p_runs.add_argument("--level", type=int)
+    args = parser.parse_args(argv)
+
+    store = ProfileStore(args.db)
+    if args.cmd == "list":
+        for name, last_used in store.list_profiles():
+            print(f"{name}\t{time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}")
+    elif args.cmd == "import":
+        with open(args.save_json, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        profile_id = store.get_profile_id(args.profile) or store.create_profile(args.profile)
+        store.import_save(profile_id, data)
+        print(f"Đã chép {args.save_json} vào profile {args.profile}")
+    elif args.cmd == "runs":
+        profile_id = store.get_profile_id(args.profile)
+        if profile_id is None:
+            parser.error(f"không có profile '{args.profile}'")
+        best = store.load_profile(profile_id)["best_times"]
+        for level_id in sorted(best):
+            print(f"level {level_id}: tốt nhất {best[level_id]} tick")
+        for level_id, seed, ticks, completed, at in store.get_runs(profile_id, args.level):
+            status = "về đích" if completed else "bỏ dở"
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(at))}  level {level_id}  {ticks} tick  {status}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,39 @@
+import atexit
 import json
 import os
+import threading
+import time
 
 
 class SaveManager:
+    # Ghi trễ (write-behind): save() chụp dữ liệu thành text JSON ngay trên thread gọi (game thread)
+    # rồi đánh dấu "dirty"; thread nền chỉ ghi text đã chụp, gom các lần save liên tiếp
+    # (mỗi lần nhặt trái cây...) thành 1 lần ghi file sau WRITE_DELAY giây không có thay đổi mới,
+    # nhưng không trễ quá MAX_WRITE_DELAY kể từ thay đổi đầu tiên.
+    WRITE_DELAY = 0.5
+    MAX_WRITE_DELAY = 2.0
+
     def __init__(self, path="data/save.json"):
+        # path=None -> save chỉ nằm trong RAM (dùng khi chấm bài, không ghi đè save thật)
         self.path = path
         self.data = self._default_data()
+
+        self._cond = threading.Condition()   # bảo vệ trạng thái dirty + text đã chụp
+        self._io_lock = threading.Lock()     # chỉ 1 lần ghi file tại 1 thời điểm
+        self._dirty = False
+        self._first_mark = self._last_mark = 0.0
+        self._text = None                    # snapshot JSON mới nhất (chuỗi, không đổi sau khi chụp)
+        self._version = 0                    # tăng mỗi lần chụp snapshot
+        self._written_version = 0
+        self._writer = None
+        self._closed = False
+
+        if self.path is None:
+            return
         self._ensure_dir()
         self.load()
+        # Thoát mà quên flush: vẫn ghi nốt thay đổi cuối
+        atexit.register(self.flush)
 
     # ================= CORE =================
     def _default_data(self):
@@ -19,7 +45,8 @@ class SaveManager:
             "characters": {
                 "owned": ["Virtual Guy"],
                 "selected": "Virtual Guy"
-            }
+            },
+            "best_times": {}
         }
 
     def _ensure_dir(self):
@@ -28,6 +55,7 @@ class SaveManager:
     def load(self):
         if not os.path.exists(self.path):
             self.save()
+            self.flush()
             return
 
         try:
@@ -36,12 +64,101 @@ class SaveManager:
         except (json.JSONDecodeError, OSError):
             self.data = self._default_data()
             self.save()
+            self.flush()
 
         self._normalize()
 
     def save(self):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=4, ensure_ascii=False)
+        """Chụp dữ liệu hiện tại và đánh dấu đã đổi; file được ghi ở thread nền (xem WRITE_DELAY)"""
+        if self.path is None:
+            return
+        # Chụp trên thread đang sửa self.data -> thread nền không bao giờ đọc dict đang bị sửa dở
+        text = json.dumps(self.data, indent=4, ensure_ascii=False)
+        with self._cond:
+            self._text = text
+            self._version += 1
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_mark = now
+            self._dirty = True
+            self._last_mark = now
+
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._write_loop, name="SaveWriter", daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Ghi ngay mọi thay đổi chưa ghi (qua màn, thoát game)"""
+        if self.path is None:
+            return
+        with self._cond:
+            snapshot = self._take_snapshot()
+        if snapshot:
+            self._write(*snapshot)
+
+    def close(self):
+        """Flush rồi dừng thread nền"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._writer is not None:
+            self._writer.join(timeout=1.0)
+
+    # ================= WRITE-BEHIND =================
+    def _take_snapshot(self):
+        """Gọi khi giữ _cond. Trả về (version, text) của lần save() cuối hoặc None nếu không có gì để ghi"""
+        if not self._dirty:
+            return None
+        self._dirty = False
+        return self._version, self._text
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if not self._dirty:
+                        self._cond.wait()
+                        continue
+                    deadline = min(self._last_mark + self.WRITE_DELAY, self._first_mark + self.MAX_WRITE_DELAY)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                if self._closed:
+                    return
+                snapshot = self._take_snapshot()
+
+            if snapshot:
+                self._write(*snapshot)
+
+    def _write(self, version, text):
+        """Ghi nguyên tử: file tạm cùng thư mục rồi os.replace (không bao giờ để lại save.json dở dang)"""
+        with self._io_lock:
+            if version <= self._written_version:
+                return   # đã có bản mới hơn được ghi
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._written_version = version
+            except OSError as e:
+                print(f"[SaveManager] Lỗi ghi save: {e}")
+                failed = True
+            else:
+                failed = False
+
+        if failed:
+            # Giữ lại thay đổi để lần sau (hoặc flush khi thoát) ghi lại
+            with self._cond:
+                if self._version == version:
+                    self._dirty = True
+                    self._first_mark = self._last_mark = time.monotonic()
 
     def _normalize(self):
         default = self._default_data()
@@ -94,3 +211,19 @@ class SaveManager:
         self.data["characters"]["owned"] = owned
         self.data["characters"]["selected"] = selected
         self.save()
+
+    # ================= RECORDS =================
+    def record_run(self, level_id, seed, ticks, completed):
+        """1 lượt chơi level: file JSON chỉ giữ thời gian tốt nhất (lịch sử chơi có ở ProfileSaveManager)"""
+        best = self.data["best_times"]
+        key = str(level_id)   # key JSON luôn là chuỗi
+        if completed and (key not in best or ticks < best[key]):
+            best[key] = ticks
+            self.save()
+
+    def get_best_time(self, level_id):
+        """Số tick ít nhất để qua level, None nếu chưa qua"""
+        return self.data["best_times"].get(str(level_id))
+
+    def get_runs(self, level_id=None, limit=20):
+        return []
@@ -1,6 +1,6 @@
 import os
 import pygame
-from player.animation import Animation
+from gameplay.asset_cache import load_animation
 
 
 class Enemy:
@@ -11,7 +11,7 @@ class Enemy:
     RUN = "run"
     HIT = "hit"
 
-    def __init__(self, x, y, name, props, tile_size):
+    def __init__(self, x, y, name, props, tile_size, headless=False):
         # ================= BASIC =================
         self.name = name
         self.rect = pygame.Rect(x, y, self.SIZE, self.SIZE)
@@ -49,30 +49,24 @@ class Enemy:
         self.alive = True
 
         # ================= ANIMATION =================
+        self.headless = headless
         base = f"assets/Enemies/{name}"
 
         self.animations = {
-            self.IDLE: Animation(
-                pygame.image.load(os.path.join(base, "Idle (36x30).png")).convert_alpha(),
-                36, 30, 0.25
-            ),
-            self.WALK: Animation(
-                pygame.image.load(os.path.join(base, "Walk (36x30).png")).convert_alpha(),
-                36, 30, 0.25
-            ),
-            self.RUN: Animation(
-                pygame.image.load(os.path.join(base, "Run (36x30).png")).convert_alpha(),
-                36, 30, 0.15
-            ),
-            self.HIT: Animation(
-                pygame.image.load(os.path.join(base, "Hit (36x30).png")).convert_alpha(),
-                36, 30, 0.2,
-                loop=False
-            ),
+            self.IDLE: self._load_anim(base, "Idle (36x30).png", 0.25),
+            self.WALK: self._load_anim(base, "Walk (36x30).png", 0.25),
+            self.RUN: self._load_anim(base, "Run (36x30).png", 0.15),
+            self.HIT: self._load_anim(base, "Hit (36x30).png", 0.2, loop=False),
         }
 
         self.current_anim = self.animations[self.state]
 
+    def _load_anim(self, base, filename, speed, loop=True):
+        return load_animation(
+            os.path.join(base, filename), 36, 30, speed, loop,
+            headless=self.headless
+        )
+
     # ==================================================
     # UPDATE
     # ==================================================
@@ -208,15 +202,22 @@ class Enemy:
             self.current_anim = self.animations[state]
             self.current_anim.reset()
 
-    def draw(self, surf):
+    def get_sprite(self):
+        """(frame, lật ngang, rect) đang hiển thị; None nếu đã chết"""
         if not self.alive:
-            return
+            return None
 
         img = self.current_anim.get_image()
 
         # sprite gốc nhìn TRÁI → flip khi quay PHẢI
-        if self.facing > 0:
-            img = pygame.transform.flip(img, True, False)
+        return img, self.facing > 0, img.get_rect(midbottom=self.rect.midbottom)
 
-        img_rect = img.get_rect(midbottom=self.rect.midbottom)
+    def draw(self, surf):
+        sprite = self.get_sprite()
+        if sprite is None:
+            return
+
+        img, flip, img_rect = sprite
+        if flip:
+            img = pygame.transform.flip(img, True, False)
         surf.blit(img, img_rect)
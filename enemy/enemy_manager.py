@@ -1,11 +1,12 @@
 from enemy.enemy import Enemy
 
 class EnemyManager:
-    def __init__(self):
+    def __init__(self, headless=False):
         self.enemies = []
+        self.headless = headless
 
     def add(self, x, y, name, props, tile_size):
-        enemy = Enemy(x, y, name, props, tile_size)
+        enemy = Enemy(x, y, name, props, tile_size, headless=self.headless)
         self.enemies.append(enemy)
 
     def update(self, player):
@@ -0,0 +1,76 @@
+# gameplay/asset_cache.py
+#
+# Cache ảnh / frame animation dùng chung cho cả process, key theo đường dẫn.
+# Mỗi spritesheet chỉ load + convert 1 lần (lần đầu được dùng), mọi Player / Enemy /
+# Item / Checkpoint / HUD / CharacterSelect dùng chung cùng các frame đó.
+# Animation vẫn là object riêng cho từng entity (index, timer riêng), chỉ frame là dùng chung.
+# Nếu đã build texture atlas (python -m gameplay.texture_atlas), sheet được cắt từ trang atlas
+# thay vì mở từng file PNG.
+
+import pygame
+
+from player.animation import Animation
+from gameplay.headless import png_size
+from gameplay.texture_atlas import TextureAtlas
+
+_images = {}   # (path, alpha) -> Surface
+_frames = {}   # (path, frame_w, frame_h, headless) -> tuple frame
+_atlas = None  # TextureAtlas, đọc index ở lần đầu cần
+
+
+def get_atlas():
+    global _atlas
+    if _atlas is None:
+        _atlas = TextureAtlas()
+    return _atlas
+
+
+def load_image(path, alpha=True):
+    """Ảnh đã convert (convert_alpha nếu alpha=True). KHÔNG được vẽ đè lên ảnh trả về."""
+    key = (path, alpha)
+    image = _images.get(key)
+    if image is None:
+        # Atlas lưu RGBA: chỉ dùng cho ảnh convert_alpha
+        if alpha:
+            image = get_atlas().image(path)
+        if image is None:
+            image = pygame.image.load(path)
+            image = image.convert_alpha() if alpha else image.convert()
+        _images[key] = image
+    return image
+
+
+def load_frames(path, frame_w, frame_h, headless=False):
+    """
+    Cắt spritesheet ngang thành các frame frame_w x frame_h.
+    Headless: không load ảnh, chỉ trả về đúng số frame (toàn None) đọc từ header PNG.
+    """
+    key = (path, frame_w, frame_h, headless)
+    frames = _frames.get(key)
+    if frames is not None:
+        return frames
+
+    if headless:
+        sheet_w, _ = get_atlas().size(path) or png_size(path)
+        frames = (None,) * max(1, sheet_w // frame_w)
+    else:
+        sheet = load_image(path)
+        frames = tuple(
+            sheet.subsurface((x, 0, frame_w, frame_h))
+            for x in range(0, sheet.get_width() - frame_w + 1, frame_w)
+        )
+
+    _frames[key] = frames
+    return frames
+
+
+def load_animation(path, frame_w, frame_h, speed, loop=True, headless=False):
+    """Animation mới (trạng thái riêng) trên các frame dùng chung"""
+    return Animation.from_frames(load_frames(path, frame_w, frame_h, headless), speed, loop)
+
+
+def clear():
+    global _atlas
+    _images.clear()
+    _frames.clear()
+    _atlas = None
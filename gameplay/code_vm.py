@@ -0,0 +1,413 @@
+# gameplay/code_vm.py
+#
+# Dịch code Python của học viên thành 1 mảng lệnh nhỏ (bytecode) rồi chạy dần bằng VM.
+# Chỉ chấp nhận tập con an toàn: lời gọi hàm của API, for ... in range(...), if/elif/else, pass.
+# Player._handle_code_control hỏi VM lệnh kế tiếp mỗi khi lệnh cũ xong, nên bộ nhớ chỉ
+# tỉ lệ với độ dài chương trình chứ không với số bước chạy: move_right(1000000) vẫn chỉ là
+# 1 instruction + 1 generator, và vòng lặp range() không bao giờ được "trải" ra danh sách.
+
+import ast
+import inspect
+import operator
+import time
+
+# ===== OPCODES =====
+OP_CALL = 0        # (op, tên hàm, [arg], {kwarg}, dòng)
+OP_FOR_INIT = 1    # (op, slot, start, stop, step, dòng)
+OP_FOR_NEXT = 2    # (op, slot, tên biến, pc khi hết vòng, dòng)
+OP_JUMP = 3        # (op, pc đích)
+OP_JUMP_IF_NOT = 4 # (op, điều kiện, pc đích, dòng)
+
+# Số instruction tối đa VM chạy trong 1 lần hỏi lệnh (1 tick) khi chưa sinh ra lệnh nào,
+# vd vòng lặp rỗng rất lớn -> chạy tiếp ở tick sau thay vì treo game
+OPS_PER_PULL = 10000
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_CMP_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+
+class CodeCompileError(SyntaxError):
+    """Code dùng cú pháp / hàm ngoài tập cho phép"""
+
+    def __init__(self, message, node=None):
+        super().__init__(message)
+        self.lineno = getattr(node, "lineno", None)
+
+    def __str__(self):
+        if self.lineno:
+            return f"{self.msg} (dòng {self.lineno})"
+        return self.msg
+
+
+class CodeRuntimeError(Exception):
+    """Lỗi khi VM đang chạy (chia cho 0, tham số sai kiểu...)"""
+
+    def __init__(self, message, lineno=None):
+        super().__init__(message)
+        self.lineno = lineno
+
+    def __str__(self):
+        if self.lineno:
+            return f"{self.args[0]} (dòng {self.lineno})"
+        return self.args[0]
+
+
+class CodeBudgetError(CodeRuntimeError):
+    """Chương trình vượt giới hạn tài nguyên (quá dài / chạy quá lâu)"""
+
+
+class ExecutionBudget:
+    """
+    Giới hạn cho 1 lần chạy code học viên:
+    - max_instructions / max_int_bits: kích thước chương trình đã dịch và số nguyên trong code (bộ nhớ)
+    - max_ops: tổng số instruction VM được chạy
+    - max_commands: tổng số lệnh (bước di chuyển, nhảy...) được sinh ra
+    - max_cpu_time: tổng thời gian CPU (giây) VM được dùng, chỉ tính thread đang chạy VM (không tính thread nền)
+    None = không giới hạn.
+    """
+
+    def __init__(self, max_instructions=2000, max_int_bits=64, max_ops=1_000_000,
+                 max_commands=10_000, max_cpu_time=1.0):
+        self.max_instructions = max_instructions
+        self.max_int_bits = max_int_bits
+        self.max_ops = max_ops
+        self.max_commands = max_commands
+        self.max_cpu_time = max_cpu_time
+
+
+DEFAULT_BUDGET = ExecutionBudget()
+
+
+class CompiledProgram:
+    """Mảng instruction + số slot vòng lặp cần dùng"""
+
+    def __init__(self, code, loop_slots):
+        self.code = code
+        self.loop_slots = loop_slots
+
+    def __len__(self):
+        return len(self.code)
+
+
+# ==================================================
+# COMPILER
+# ==================================================
+class _Compiler:
+    def __init__(self, api, budget):
+        self.api = api
+        self.budget = budget
+        self.code = []
+        self.loop_slots = 0
+        self.scope = []   # tên biến vòng lặp đang có hiệu lực
+
+    # ================= STATEMENTS =================
+    def block(self, body):
+        for stmt in body:
+            self.stmt(stmt)
+
+    def stmt(self, node):
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            self.call(node.value)
+        elif isinstance(node, ast.For):
+            self.for_loop(node)
+        elif isinstance(node, ast.If):
+            self.if_stmt(node)
+        elif isinstance(node, ast.Pass):
+            pass
+        else:
+            name = type(node).__name__.lower()
+            raise CodeCompileError(f"Không hỗ trợ câu lệnh '{name}'", node)
+
+    def call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in self.api:
+            raise CodeCompileError(f"Không có hàm '{ast.unparse(node.func)}'", node)
+
+        name = node.func.id
+        if any(isinstance(a, ast.Starred) for a in node.args) or any(k.arg is None for k in node.keywords):
+            raise CodeCompileError("Không hỗ trợ *args / **kwargs", node)
+
+        # Kiểm tra số lượng / tên tham số ngay lúc dịch
+        try:
+            inspect.signature(self.api[name]).bind(
+                *node.args, **{k.arg: k.value for k in node.keywords}
+            )
+        except TypeError as e:
+            raise CodeCompileError(f"{name}(): {e}", node)
+
+        allow_str = name == "print"
+        args = [self.expr(a, allow_str) for a in node.args]
+        kwargs = {k.arg: self.expr(k.value, allow_str) for k in node.keywords}
+        self.code.append((OP_CALL, name, args, kwargs, node.lineno))
+
+    def for_loop(self, node):
+        if node.orelse:
+            raise CodeCompileError("Không hỗ trợ for ... else", node)
+        if not isinstance(node.target, ast.Name):
+            raise CodeCompileError("Biến vòng lặp phải là 1 tên, vd: for i in range(3)", node)
+
+        it = node.iter
+        if not (isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range"):
+            raise CodeCompileError("Vòng for chỉ hỗ trợ range(...)", node)
+        if it.keywords or not 1 <= len(it.args) <= 3:
+            raise CodeCompileError("range() cần 1 đến 3 tham số", node)
+
+        bounds = [self.expr(a) for a in it.args]
+        if len(bounds) == 1:
+            bounds = [_const(0)] + bounds
+        if len(bounds) == 2:
+            bounds.append(_const(1))
+
+        slot = self.loop_slots
+        self.loop_slots += 1
+
+        self.code.append((OP_FOR_INIT, slot, *bounds, node.lineno))
+        next_pc = len(self.code)
+        self.code.append(None)   # điền pc khi hết vòng sau khi dịch xong thân
+
+        self.scope.append(node.target.id)
+        self.block(node.body)
+        self.scope.pop()
+
+        self.code.append((OP_JUMP, next_pc))
+        self.code[next_pc] = (OP_FOR_NEXT, slot, node.target.id, len(self.code), node.lineno)
+
+    def if_stmt(self, node):
+        test = self.expr(node.test)
+        jump_pc = len(self.code)
+        self.code.append(None)
+
+        self.block(node.body)
+
+        if node.orelse:
+            end_pc = len(self.code)
+            self.code.append(None)
+            self.code[jump_pc] = (OP_JUMP_IF_NOT, test, len(self.code), node.lineno)
+            self.block(node.orelse)
+            self.code[end_pc] = (OP_JUMP, len(self.code))
+        else:
+            self.code[jump_pc] = (OP_JUMP_IF_NOT, test, len(self.code), node.lineno)
+
+    # ================= EXPRESSIONS =================
+    def expr(self, node, allow_str=False):
+        """Biểu thức -> hàm env -> giá trị"""
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, str) and allow_str:
+                return _const(value)
+            if isinstance(value, int) and self.budget.max_int_bits is not None \
+                    and value.bit_length() > self.budget.max_int_bits:
+                raise CodeCompileError("Số quá lớn", node)
+            if isinstance(value, (bool, int, float)):
+                return _const(value)
+            raise CodeCompileError(f"Không hỗ trợ giá trị {value!r}", node)
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name not in self.scope:
+                raise CodeCompileError(f"Biến '{name}' chưa được định nghĩa", node)
+            return lambda env: env[name]
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            fn = _BIN_OPS[type(node.op)]
+            left, right = self.expr(node.left), self.expr(node.right)
+            return lambda env: fn(left(env), right(env))
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            fn = _UNARY_OPS[type(node.op)]
+            operand = self.expr(node.operand)
+            return lambda env: fn(operand(env))
+
+        if isinstance(node, ast.Compare) and all(type(op) in _CMP_OPS for op in node.ops):
+            left = self.expr(node.left)
+            pairs = [(_CMP_OPS[type(op)], self.expr(c)) for op, c in zip(node.ops, node.comparators)]
+
+            def compare(env):
+                a = left(env)
+                for fn, right in pairs:
+                    b = right(env)
+                    if not fn(a, b):
+                        return False
+                    a = b
+                return True
+            return compare
+
+        if isinstance(node, ast.BoolOp):
+            values = [self.expr(v) for v in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda env: all(v(env) for v in values)
+            return lambda env: any(v(env) for v in values)
+
+        raise CodeCompileError(f"Không hỗ trợ biểu thức '{ast.unparse(node)}'", node)
+
+
+def _const(value):
+    return lambda env: value
+
+
+def compile_program(source, api, budget=DEFAULT_BUDGET):
+    """
+    Dịch source -> CompiledProgram. api: {tên hàm: callable} (chỉ dùng chữ ký để kiểm tra tham số).
+    Ném SyntaxError / CodeCompileError nếu code sai hoặc dùng cú pháp không hỗ trợ,
+    CodeBudgetError nếu chương trình dịch ra quá dài.
+    """
+    tree = ast.parse(source, filename="<string>", mode="exec")
+    compiler = _Compiler(api, budget)
+    compiler.block(tree.body)
+
+    limit = budget.max_instructions
+    if limit is not None and len(compiler.code) > limit:
+        raise CodeBudgetError(f"Chương trình quá dài: {len(compiler.code)} > {limit} instruction")
+    return CompiledProgram(compiler.code, compiler.loop_slots)
+
+
+# ==================================================
+# VM
+# ==================================================
+class CodeVM:
+    """
+    Chạy CompiledProgram từng chút một. Hàm API trả về:
+    - None: không sinh lệnh (vd print)
+    - iterable lệnh (thường là generator): VM lấy từng lệnh mỗi khi Player hỏi,
+      hết thì chạy tiếp chương trình
+    """
+
+    def __init__(self, program, api, budget=DEFAULT_BUDGET):
+        self.program = program
+        self.api = api
+        self.budget = budget
+
+        # Đã dùng bao nhiêu so với budget
+        self.ops = 0
+        self.commands = 0
+        self.cpu_time = 0.0
+
+        self.pc = 0
+        self.env = {}
+        self.loops = [None] * program.loop_slots
+
+        self.stream = None   # lệnh đang được sinh dần từ lời gọi API hiện tại
+
+        self.finished = len(program) == 0
+        self.error = None
+        self.lineno = None   # dòng của instruction vừa chạy (để báo lỗi)
+
+    def next_command(self, max_ops=OPS_PER_PULL):
+        """Lệnh kế tiếp; None nếu chương trình đã xong / lỗi, hoặc tick này chạy hết max_ops"""
+        if self.finished:
+            return None
+
+        start = time.thread_time()
+        try:
+            if self.stream is not None:
+                command = self._pull()
+                if command is not None:
+                    return command
+            return self._run(max_ops)
+        except CodeRuntimeError as e:
+            if e.lineno is None:
+                e.lineno = self.lineno
+            self._fail(e)
+        except (ArithmeticError, TypeError, ValueError) as e:
+            self._fail(CodeRuntimeError(str(e), self.lineno))
+        finally:
+            self.cpu_time += time.thread_time() - start
+            limit = self.budget.max_cpu_time
+            if limit is not None and self.cpu_time > limit and not self.finished:
+                self._fail(CodeBudgetError(
+                    f"Chương trình quá dài: chạy quá {limit:g}s CPU", self.lineno
+                ))
+        return None
+
+    def _run(self, max_ops):
+        code = self.program.code
+        env = self.env
+
+        max_total = self.budget.max_ops
+
+        for _ in range(max_ops):
+            if self.pc >= len(code):
+                self.finished = True
+                return None
+
+            self.ops += 1
+            if max_total is not None and self.ops > max_total:
+                raise CodeBudgetError(f"Chương trình quá dài: vượt {max_total} bước tính toán")
+
+            ins = code[self.pc]
+            op = ins[0]
+            if op != OP_JUMP:
+                self.lineno = ins[-1]
+
+            if op == OP_CALL:
+                self.pc += 1
+                _, name, args, kwargs, _ = ins
+                result = self.api[name](
+                    *[a(env) for a in args],
+                    **{k: v(env) for k, v in kwargs.items()}
+                )
+                if result is not None:
+                    self.stream = iter(result)
+                    command = self._pull()
+                    if command is not None:
+                        return command
+
+            elif op == OP_FOR_INIT:
+                _, slot, start, stop, step, _ = ins
+                # range() là lazy: vòng 10^9 lần vẫn chỉ tốn 1 iterator
+                self.loops[slot] = iter(range(start(env), stop(env), step(env)))
+                self.pc += 1
+
+            elif op == OP_FOR_NEXT:
+                _, slot, var, end_pc, _ = ins
+                value = next(self.loops[slot], None)
+                if value is None:
+                    self.loops[slot] = None
+                    self.pc = end_pc
+                else:
+                    env[var] = value
+                    self.pc += 1
+
+            elif op == OP_JUMP:
+                self.pc = ins[1]
+
+            elif op == OP_JUMP_IF_NOT:
+                self.pc = self.pc + 1 if ins[1](env) else ins[2]
+
+        return None
+
+    def _pull(self):
+        """Lệnh kế tiếp từ stream hiện tại, None nếu stream đã hết"""
+        command = next(self.stream, None)
+        if command is None:
+            self.stream = None
+            return None
+
+        self.commands += 1
+        limit = self.budget.max_commands
+        if limit is not None and self.commands > limit:
+            raise CodeBudgetError(f"Chương trình quá dài: vượt {limit} lệnh di chuyển")
+        return command
+
+    def _fail(self, error):
+        self.error = error
+        self.finished = True
+        self.stream = None
+        print(f"[CodeVM] Lỗi khi chạy code: {error}")
@@ -0,0 +1,41 @@
+# gameplay/fixed_timestep.py
+#
+# Mô phỏng theo bước cố định (fixed timestep): Player / Enemy / Animation / lệnh code đều
+# tiến theo từng "tick", nên mỗi giây thực phải chạy đúng SIM_HZ tick dù máy vẽ được bao nhiêu FPS.
+# main.py cộng dồn thời gian thực vào accumulator và chạy đủ số tick; phần lẻ còn lại (alpha)
+# dùng để nội suy vị trí khi vẽ. Headless (grade.py, turbo) gọi thẳng level_manager.update(SIM_DT, ...).
+
+SIM_HZ = 60
+SIM_DT = 1 / SIM_HZ
+
+
+class FixedTimestep:
+    """Accumulator: đổi thời gian thực của mỗi frame ra số tick mô phỏng cần chạy"""
+
+    def __init__(self, step=SIM_DT, max_steps=5):
+        self.step = step
+        self.max_steps = max_steps   # chạy bù tối đa mỗi frame, tránh "spiral of death"
+        self.accumulator = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, frame_dt):
+        """Cộng thời gian của frame vừa qua, trả về số tick cần chạy"""
+        self.accumulator += frame_dt
+
+        steps = 0
+        while self.accumulator >= self.step and steps < self.max_steps:
+            self.accumulator -= self.step
+            steps += 1
+
+        # Máy quá chậm (hoặc vừa load level lâu): bỏ phần tụt lại thay vì chạy bù mãi
+        if self.accumulator >= self.step:
+            self.accumulator %= self.step
+
+        return steps
+
+    @property
+    def alpha(self):
+        """Vị trí giữa tick trước và tick hiện tại (0..1) để nội suy khi vẽ"""
+        return min(1.0, self.accumulator / self.step)
@@ -0,0 +1,31 @@
+# gameplay/headless.py
+#
+# Chế độ headless: chạy mô phỏng (vật lý, enemy, item, checkpoint) mà không cần
+# màn hình / video driver. Dùng cho chấm bài tự động trên server không có GPU.
+# Bật bằng biến môi trường CODEFRUIT_HEADLESS=1 hoặc LevelManager(save, headless=True).
+
+import os
+import struct
+
+HEADLESS_ENV = "CODEFRUIT_HEADLESS"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def headless_from_env():
+    return os.environ.get(HEADLESS_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def png_size(path):
+    """Đọc (width, height) từ header PNG mà không decode ảnh"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(24)
+    except OSError:
+        return 0, 0
+
+    if len(header) < 24 or not header.startswith(_PNG_SIGNATURE) or header[12:16] != b"IHDR":
+        return 0, 0
+
+    return struct.unpack(">II", header[16:24])
+
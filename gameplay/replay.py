@@ -0,0 +1,435 @@
+# gameplay/replay.py
+#
+# Ghi lại 1 lần chơi (từ lúc load level tới lúc rời level) thành file nhị phân nhỏ và phát lại
+# y hệt (mô phỏng là tất định: tick cố định + seed của level):
+# - timeline: bitmask phím của từng tick (nén RLE) xen kẽ các sự kiện code
+#   (load chương trình, reset, enqueue lệnh) đúng vị trí tick của chúng
+# - mỗi chương trình code: dãy yêu cầu lệnh (tên, tham số) mà CommandEngine đã lấy ra,
+#   kèm số lần VM "chưa ra lệnh" trước đó -> phát lại không cần chạy lại code học viên
+# - seed của level (nhiệm vụ trái cây), nhân vật, trạng thái ban đầu
+#
+# Phát lại (headless hoặc có cửa sổ, tốc độ tuỳ ý):
+#   python -m gameplay.replay data/replays/level3_....cfr --headless
+#   python -m gameplay.replay data/replays/level3_....cfr --speed 4
+
+import argparse
+import os
+import struct
+import sys
+
+import pygame
+
+from gameplay.fixed_timestep import SIM_DT, SIM_HZ
+
+MAGIC = b"CFRP"
+VERSION = 1
+EXTENSION = ".cfr"
+
+# ===== BITMASK PHÍM =====
+KEY_LEFT = 1
+KEY_RIGHT = 2
+KEY_DOWN = 4
+KEY_JUMP = 8
+KEY_DASH = 16
+HAS_KEYS = 128   # tick có truyền keys (không phải None)
+
+_KEY_BITS = {
+    pygame.K_a: KEY_LEFT, pygame.K_LEFT: KEY_LEFT,
+    pygame.K_d: KEY_RIGHT, pygame.K_RIGHT: KEY_RIGHT,
+    pygame.K_s: KEY_DOWN, pygame.K_DOWN: KEY_DOWN,
+    pygame.K_SPACE: KEY_JUMP, pygame.K_UP: KEY_JUMP,
+    pygame.K_LSHIFT: KEY_DASH, pygame.K_RSHIFT: KEY_DASH,
+}
+
+# ===== TIMELINE =====
+EV_KEYS = 0      # (EV_KEYS, mask, số tick)
+EV_LOAD = 1      # load chương trình kế tiếp trong danh sách programs
+EV_RESET = 2     # player.reset_code_state()
+EV_ENQUEUE = 3   # (EV_ENQUEUE, tên, tham số)
+
+# ===== LỆNH CỦA 1 CHƯƠNG TRÌNH =====
+CMD_REQUEST = 0  # (CMD_REQUEST, idle, tên, tham số)
+CMD_END = 1      # (CMD_END, idle): chương trình chạy xong
+CMD_IDLE = 2     # (CMD_IDLE, idle): bị reset khi VM đang chạy dở, không ra lệnh nữa
+
+MAX_RUN = 0xFFFF
+
+_HEADER = struct.Struct("<4sBHIBB")   # magic, version, level, seed, state ban đầu, flags
+_FLAG_COMPLETED = 1
+
+
+def encode_keys(keys):
+    if keys is None:
+        return 0
+    mask = HAS_KEYS
+    for key, bit in _KEY_BITS.items():
+        if keys[key]:
+            mask |= bit
+    return mask
+
+
+class ReplayKeys:
+    """Thay cho pygame.key.get_pressed() khi phát lại"""
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return bool(self.mask & _KEY_BITS.get(key, 0))
+
+
+# ==================================================
+# DỮ LIỆU
+# ==================================================
+class Replay:
+    def __init__(self, level_id, seed, character, completed=False, initial_state=0):
+        self.level_id = level_id
+        self.seed = seed
+        self.character = character
+        self.completed = completed          # level đã qua trước đó (cờ đã bật sẵn)
+        self.initial_state = initial_state  # LevelState lúc tick đầu tiên
+        self.timeline = []
+        self.programs = []
+
+    @property
+    def ticks(self):
+        return sum(ev[2] for ev in self.timeline if ev[0] == EV_KEYS)
+
+    # ================= ENCODE =================
+    def to_bytes(self):
+        names = []
+        index = {}
+
+        def name_id(name):
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+            return index[name]
+
+        def pack_args(args):
+            # Giữ đúng kiểu (int / float): vel_x int hay float cho kết quả vật lý khác nhau
+            fmt = "".join("q" if isinstance(a, int) else "d" for a in args)
+            return struct.pack("<B", len(args)) + fmt.encode("ascii") + struct.pack(f"<{fmt}", *args)
+
+        body = bytearray()
+        body += struct.pack("<I", len(self.timeline))
+        for ev in self.timeline:
+            tag = ev[0]
+            body += struct.pack("<B", tag)
+            if tag == EV_KEYS:
+                body += struct.pack("<BH", ev[1], ev[2])
+            elif tag == EV_ENQUEUE:
+                body += struct.pack("<B", name_id(ev[1])) + pack_args(ev[2])
+
+        body += struct.pack("<I", len(self.programs))
+        for program in self.programs:
+            body += struct.pack("<I", len(program))
+            for entry in program:
+                body += struct.pack("<BI", entry[0], entry[1])
+                if entry[0] == CMD_REQUEST:
+                    body += struct.pack("<B", name_id(entry[2])) + pack_args(entry[3])
+
+        flags = _FLAG_COMPLETED if self.completed else 0
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, self.level_id, self.seed, self.initial_state, flags))
+        out += _pack_str(self.character)
+        out += struct.pack("<B", len(names))
+        for name in names:
+            out += _pack_str(name)
+        return bytes(out + body)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    # ================= DECODE =================
+    @classmethod
+    def from_bytes(cls, data):
+        reader = _Reader(data)
+        magic, version, level_id, seed, state, flags = reader.unpack(_HEADER)
+        if magic != MAGIC:
+            raise ValueError("Không phải file replay")
+        if version != VERSION:
+            raise ValueError(f"Replay phiên bản {version} không được hỗ trợ")
+
+        replay = cls(level_id, seed, reader.string(), bool(flags & _FLAG_COMPLETED), state)
+        names = [reader.string() for _ in range(reader.value("<B"))]
+
+        def read_args():
+            count = reader.value("<B")
+            fmt = reader.raw(count).decode("ascii")
+            return reader.unpack(struct.Struct(f"<{fmt}"))
+
+        for _ in range(reader.value("<I")):
+            tag = reader.value("<B")
+            if tag == EV_KEYS:
+                replay.timeline.append((EV_KEYS, *reader.unpack(struct.Struct("<BH"))))
+            elif tag == EV_ENQUEUE:
+                replay.timeline.append((EV_ENQUEUE, names[reader.value("<B")], read_args()))
+            else:
+                replay.timeline.append((tag,))
+
+        for _ in range(reader.value("<I")):
+            program = []
+            for _ in range(reader.value("<I")):
+                kind, idle = reader.unpack(struct.Struct("<BI"))
+                if kind == CMD_REQUEST:
+                    program.append((kind, idle, names[reader.value("<B")], read_args()))
+                else:
+                    program.append((kind, idle))
+            replay.programs.append(program)
+
+        return replay
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def _pack_str(text):
+    raw = text.encode("utf-8")
+    return struct.pack("<B", len(raw)) + raw
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def value(self, fmt):
+        return self.unpack(struct.Struct(fmt))[0]
+
+    def raw(self, size):
+        data = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def string(self):
+        return self.raw(self.value("<B")).decode("utf-8")
+
+
+# ==================================================
+# GHI
+# ==================================================
+class ReplayRecorder:
+    """
+    Gắn vào LevelManager (record_tick mỗi tick) và CommandEngine của player
+    (on_load / on_reset / on_enqueue / on_pull).
+    """
+
+    def __init__(self, level_id, seed, character, completed=False):
+        self.replay = Replay(level_id, seed, character, completed)
+        self._started = False
+        self._program = None   # danh sách lệnh của chương trình đang chạy
+        self._idle = 0
+
+    @property
+    def ticks(self):
+        return self.replay.ticks
+
+    # ================= LEVEL MANAGER =================
+    def record_tick(self, state, keys):
+        if not self._started:
+            self.replay.initial_state = int(state)
+            self._started = True
+
+        mask = encode_keys(keys)
+        timeline = self.replay.timeline
+        last = timeline[-1] if timeline else None
+        if last and last[0] == EV_KEYS and last[1] == mask and last[2] < MAX_RUN:
+            timeline[-1] = (EV_KEYS, mask, last[2] + 1)
+        else:
+            timeline.append((EV_KEYS, mask, 1))
+
+    # ================= COMMAND ENGINE =================
+    def on_load(self):
+        self._program = []
+        self._idle = 0
+        self.replay.programs.append(self._program)
+        self.replay.timeline.append((EV_LOAD,))
+
+    def on_reset(self, program_active):
+        if program_active and self._program is not None and self._idle:
+            self._program.append((CMD_IDLE, self._idle))
+        self._program = None
+        self._idle = 0
+        self.replay.timeline.append((EV_RESET,))
+
+    def on_enqueue(self, name, args):
+        self.replay.timeline.append((EV_ENQUEUE, name, tuple(args)))
+
+    def on_pull(self, request, finished):
+        if self._program is None:
+            return
+        if request is not None:
+            name, args = request
+            self._program.append((CMD_REQUEST, self._idle, name, tuple(args)))
+            self._idle = 0
+        elif finished:
+            self._program.append((CMD_END, self._idle))
+            self._program = None
+            self._idle = 0
+        else:
+            self._idle += 1
+
+
+# ==================================================
+# PHÁT LẠI
+# ==================================================
+class ReplayProgram:
+    """Thay cho CodeVM: trả lại đúng dãy yêu cầu lệnh đã ghi"""
+
+    def __init__(self, entries):
+        self.entries = iter(entries)
+        self.finished = False
+        self.error = None
+        self._entry = None
+        self._idle = 0
+
+    def next_command(self):
+        if self.finished:
+            return None
+
+        if self._entry is None:
+            self._entry = next(self.entries, None)
+            if self._entry is None:
+                self.finished = True
+                return None
+            self._idle = self._entry[1]
+
+        if self._idle > 0:
+            self._idle -= 1
+            return None
+
+        entry, self._entry = self._entry, None
+        if entry[0] == CMD_REQUEST:
+            return entry[2], entry[3]
+        if entry[0] == CMD_END:
+            self.finished = True
+        else:
+            # CMD_IDLE: lúc ghi bị reset khi VM đang chạy dở -> chờ mãi tới khi bị reset
+            self._entry = entry
+        return None
+
+
+class ReplayPlayer:
+    """
+    Mô phỏng lại replay trên 1 LevelManager (headless hoặc có vẽ), từng tick.
+    Nên dùng LevelManager với SaveManager(None): nhân vật trong save bị đổi theo replay.
+    """
+
+    def __init__(self, replay, level_manager):
+        self.replay = replay
+        self.lm = level_manager
+
+        self.lm.save.data["characters"]["selected"] = replay.character
+        self.lm.load_level(replay.level_id, seed=replay.seed)
+        self.lm.state = type(self.lm.state)(replay.initial_state)
+        if replay.completed and self.lm.checkpoint:
+            self.lm.checkpoint.force_active()
+        # Phím lấy từ replay, không phụ thuộc cửa sổ có focus hay không
+        self.lm.player.check_focus = False
+
+        self.tick = 0
+        self._events = iter(replay.timeline)
+        self._programs = iter(replay.programs)
+        self._keys = None
+        self._run = 0
+        self.done = False
+
+    def step(self):
+        """Chạy 1 tick; False khi đã hết replay"""
+        while self._run == 0:
+            ev = next(self._events, None)
+            if ev is None:
+                self.done = True
+                return False
+
+            tag = ev[0]
+            if tag == EV_KEYS:
+                self._keys = ReplayKeys(ev[1]) if ev[1] & HAS_KEYS else None
+                self._run = ev[2]
+            elif tag == EV_LOAD:
+                self.lm.player.load_program(ReplayProgram(next(self._programs, ())))
+            elif tag == EV_RESET:
+                self.lm.player.reset_code_state()
+            elif tag == EV_ENQUEUE:
+                self.lm.player.enqueue_command(ev[1], *ev[2])
+
+        self._run -= 1
+        self.lm.update(SIM_DT, self._keys)
+        self.tick += 1
+        return True
+
+    def run(self, max_ticks=None):
+        while not self.done and (max_ticks is None or self.tick < max_ticks):
+            self.step()
+        return self.tick
+
+
+# ==================================================
+# CLI
+# ==================================================
+def _summary(path, replayer):
+    lm, player = replayer.lm, replayer.lm.player
+    return (f"{path}: level {replayer.replay.level_id}, seed {replayer.replay.seed}, "
+            f"{replayer.tick} tick, state {lm.state.name}, "
+            f"player {player.rect.topleft}, deaths {player.deaths}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Phát lại file replay (.cfr)")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--headless", action="store_true", help="không mở cửa sổ, chỉ in kết quả")
+    parser.add_argument("--speed", type=float, default=1.0, help="hệ số tốc độ khi có cửa sổ")
+    args = parser.parse_args(argv)
+
+    from data.save_manager import SaveManager
+    from level.level_manager import LevelManager
+
+    if not args.headless:
+        pygame.init()
+        screen = pygame.display.set_mode((960, 640))
+    lm = LevelManager(SaveManager(None), headless=args.headless)
+
+    for path in args.files:
+        replayer = ReplayPlayer(Replay.load(path), lm)
+
+        if args.headless:
+            replayer.run()
+            print(_summary(path, replayer))
+            continue
+
+        pygame.display.set_caption(f"Replay: {os.path.basename(path)}")
+        world = pygame.Surface((lm.map_w, lm.map_h)).convert()
+        clock = pygame.time.Clock()
+        pending = 0.0
+        while not replayer.done:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+            pending += clock.tick(SIM_HZ) / 1000 * SIM_HZ * args.speed
+            while pending >= 1 and replayer.step():
+                pending -= 1
+
+            world.fill((20, 20, 25))
+            lm.draw(world)
+            screen.blit(pygame.transform.scale(world, screen.get_size()), (0, 0))
+            pygame.display.flip()
+
+        print(_summary(path, replayer))
+
+    if not args.headless:
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
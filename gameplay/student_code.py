@@ -0,0 +1,67 @@
+# gameplay/student_code.py
+#
+# Môi trường chạy code của học viên ở các level "code":
+# CodePanel (các dòng code) -> dịch sang bytecode (gameplay/code_vm.py) với API
+# move_right / move_left / jump / wait -> CommandEngine của Player chạy dần qua CodeVM.
+# Dùng chung cho main.py và công cụ chấm bài (grade.py).
+
+from gameplay.code_vm import DEFAULT_BUDGET, CodeRuntimeError, CodeVM, compile_program
+
+
+# ================= API =================
+# Yêu cầu lệnh (tên trong registry player/commands.py, tham số) dùng chung, không tạo mới mỗi bước
+MOVE_RIGHT = ("move", (1,))
+MOVE_LEFT = ("move", (-1,))
+JUMP = ("jump", ())
+
+
+def _steps(name, steps):
+    if isinstance(steps, bool) or not isinstance(steps, int):
+        raise CodeRuntimeError(f"{name}() cần số nguyên, nhận được {steps!r}")
+    return steps
+
+
+def _repeat(count, request):
+    """Sinh `count` lần cùng 1 yêu cầu; Player chỉ lấy khi cần tới"""
+    for _ in range(count):
+        yield request
+
+
+def _api_move_right(steps=1):
+    return _repeat(_steps("move_right", steps), MOVE_RIGHT)
+
+def _api_move_left(steps=1):
+    return _repeat(_steps("move_left", steps), MOVE_LEFT)
+
+def _api_jump():
+    return _repeat(1, JUMP)
+
+def _api_wait(seconds=1):
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds < 0:
+        raise CodeRuntimeError(f"wait() cần số giây >= 0, nhận được {seconds!r}")
+    return _repeat(1, ("wait", (seconds,)))
+
+def _api_print(*args, sep=" ", end="\n"):
+    print(*args, sep=sep, end=end)
+
+
+# Các hàm mà code học viên được phép gọi. Mỗi hàm trả về generator yêu cầu lệnh hoặc None;
+# VM chỉ lấy khi Player cần nên move_right(1000000) chỉ là 1 generator, không phải 1 triệu object.
+STUDENT_API = {
+    "move_right": _api_move_right,
+    "move_left": _api_move_left,
+    "jump": _api_jump,
+    "wait": _api_wait,
+    "print": _api_print,
+}
+
+
+def run_student_code(player, lines, budget=DEFAULT_BUDGET):
+    """
+    Reset lệnh của player, dịch code học viên rồi giao chương trình cho player chạy.
+    Lỗi cú pháp / cú pháp không hỗ trợ (SyntaxError) hoặc chương trình quá dài (CodeBudgetError)
+    được ném ra cho nơi gọi xử lý; lỗi lúc chạy nằm ở player.code_error.
+    """
+    player.reset_code_state()
+    program = compile_program("\n".join(lines), STUDENT_API, budget)
+    player.load_program(CodeVM(program, STUDENT_API, budget))
@@ -0,0 +1,206 @@
+# gameplay/texture_atlas.py
+#
+# Gộp các spritesheet nhỏ (nhân vật, enemy, trái cây, checkpoint, bẫy) thành vài ảnh atlas lớn
+# + 1 file index (đường dẫn sheet -> trang atlas + rect). Lúc chạy chỉ cần mở/decode vài trang
+# atlas thay vì hàng trăm file PNG riêng lẻ (chậm trên ổ mạng của phòng lab).
+# Sheet nào chưa có trong atlas hoặc đã bị sửa sau khi pack -> asset cache load file riêng như cũ.
+#
+# Build atlas (không cần màn hình):
+#   python -m gameplay.texture_atlas
+
+import json
+import os
+import sys
+
+import pygame
+
+ATLAS_DIR = "assets/.atlas"
+INDEX_NAME = "index.json"
+VERSION = 1
+
+SOURCE_DIRS = (
+    "assets/Main Characters",
+    "assets/Enemies",
+    "assets/Items/Fruits",
+    "assets/Checkpoints",
+    "assets/Traps",
+)
+
+PAGE_SIZE = 2048
+PADDING = 2
+
+
+def normalize_path(path):
+    """Key thống nhất cho index: đường dẫn tương đối, dùng '/'"""
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class TextureAtlas:
+    """Index atlas đã build; các trang atlas chỉ được load khi có sheet đầu tiên cần tới"""
+
+    def __init__(self, atlas_dir=ATLAS_DIR):
+        self.atlas_dir = atlas_dir
+        self.pages = []        # tên file từng trang
+        self.sprites = {}      # path -> {"page", "rect", "stat"}
+        self._surfaces = {}    # page -> Surface đã convert
+
+        self._load_index()
+
+    def _load_index(self):
+        path = os.path.join(self.atlas_dir, INDEX_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if index.get("version") != VERSION:
+            print(f"[TextureAtlas] Index cũ, bỏ qua: {path}")
+            return
+
+        self.pages = index.get("pages", [])
+        self.sprites = index.get("sprites", {})
+
+    # ================= LOOKUP =================
+    def entry(self, path):
+        """Thông tin sheet trong atlas, None nếu không có hoặc file gốc đã thay đổi"""
+        info = self.sprites.get(normalize_path(path))
+        if info is None:
+            return None
+
+        # File gốc không còn -> vẫn dùng atlas; file gốc bị sửa -> atlas đã cũ
+        current = _stat_key(path)
+        if current is not None and current != info["stat"]:
+            return None
+        return info
+
+    def size(self, path):
+        info = self.entry(path)
+        if info is None:
+            return None
+        return info["rect"][2], info["rect"][3]
+
+    def image(self, path):
+        """Sheet dưới dạng subsurface của trang atlas (dùng chung, chỉ đọc)"""
+        info = self.entry(path)
+        if info is None:
+            return None
+
+        page = self._page(info["page"])
+        if page is None:
+            return None
+        return page.subsurface(pygame.Rect(info["rect"]))
+
+    def _page(self, index):
+        surface = self._surfaces.get(index)
+        if surface is None:
+            try:
+                path = os.path.join(self.atlas_dir, self.pages[index])
+                surface = pygame.image.load(path).convert_alpha()
+            except (IndexError, pygame.error, FileNotFoundError) as e:
+                print(f"[TextureAtlas] Không load được trang {index}: {e}")
+                return None
+            self._surfaces[index] = surface
+        return surface
+
+    def __contains__(self, path):
+        return normalize_path(path) in self.sprites
+
+    def __len__(self):
+        return len(self.sprites)
+
+
+# ==================================================
+# PACK (OFFLINE)
+# ==================================================
+def _collect_sources(source_dirs):
+    paths = []
+    for base in source_dirs:
+        for root, _, files in os.walk(base):
+            for name in files:
+                if name.lower().endswith(".png"):
+                    paths.append(normalize_path(os.path.join(root, name)))
+    return sorted(paths)
+
+
+def _pack_shelves(sizes, page_size=PAGE_SIZE, padding=PADDING):
+    """
+    Xếp theo kệ (shelf): sheet cao xếp trước, mỗi kệ cao bằng sheet đầu tiên của kệ.
+    Trả về {key: (page, x, y)}.
+    """
+    order = sorted(sizes, key=lambda k: (-sizes[k][1], -sizes[k][0], k))
+    placed = {}
+
+    page = 0
+    x = y = shelf_h = 0
+    for key in order:
+        w, h = sizes[key]
+        if w > page_size or h > page_size:
+            raise ValueError(f"{key} ({w}x{h}) lớn hơn trang atlas {page_size}")
+
+        if x + w > page_size:
+            x = 0
+            y += shelf_h + padding
+            shelf_h = 0
+        if y + h > page_size:
+            page += 1
+            x = y = shelf_h = 0
+
+        placed[key] = (page, x, y)
+        x += w + padding
+        shelf_h = max(shelf_h, h)
+
+    return placed
+
+
+def build_atlas(source_dirs=SOURCE_DIRS, atlas_dir=ATLAS_DIR, page_size=PAGE_SIZE):
+    sheets = {}
+    for path in _collect_sources(source_dirs):
+        try:
+            sheets[path] = pygame.image.load(path)
+        except pygame.error as e:
+            print(f"[TextureAtlas] Bỏ qua {path}: {e}")
+
+    sizes = {path: sheet.get_size() for path, sheet in sheets.items()}
+    placed = _pack_shelves(sizes, page_size)
+
+    # Trang cuối thường không đầy: cắt bớt chiều cao cho nhẹ
+    page_count = max((p for p, _, _ in placed.values()), default=-1) + 1
+    page_h = [0] * page_count
+    for path, (page, x, y) in placed.items():
+        page_h[page] = max(page_h[page], y + sizes[path][1])
+
+    surfaces = [pygame.Surface((page_size, h), pygame.SRCALPHA) for h in page_h]
+    sprites = {}
+    for path, (page, x, y) in placed.items():
+        surfaces[page].blit(sheets[path], (x, y))
+        w, h = sizes[path]
+        sprites[path] = {"page": page, "rect": [x, y, w, h], "stat": _stat_key(path)}
+
+    os.makedirs(atlas_dir, exist_ok=True)
+    pages = []
+    for i, surface in enumerate(surfaces):
+        name = f"atlas_{i}.png"
+        pygame.image.save(surface, os.path.join(atlas_dir, name))
+        pages.append(name)
+
+    index_path = os.path.join(atlas_dir, INDEX_NAME)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "pages": pages, "sprites": sprites}, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+    print(f"[TextureAtlas] {len(sprites)} sheet -> {len(pages)} trang atlas ({atlas_dir})")
+    return sprites
+
+
+if __name__ == "__main__":
+    build_atlas(tuple(sys.argv[1:]) or SOURCE_DIRS)
@@ -0,0 +1,233 @@
+# grade.py
+#
+# Chấm bài tự động cho các level "code" (không cần màn hình).
+# Mỗi file lời giải (.py) được chạy qua đúng pipeline của game:
+#   các dòng code (như CodePanel) -> run_student_code (dịch sang bytecode) -> CodeVM của Player
+# rồi mô phỏng với bước thời gian cố định trên LevelManager headless.
+#
+# Ví dụ:
+#   python grade.py submissions/ --levels 1 3 5 --out report.csv
+#   python grade.py submissions/ --levels 11 13 --out report.json --workers 8
+#
+# Cấu trúc thư mục lời giải:
+#   submissions/alice.py            -> chấm trên tất cả level được chỉ định
+#   submissions/bob/level3.py       -> chỉ chấm level 3 (học viên "bob")
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+# Banner của pygame in ra stdout sẽ làm hỏng báo cáo CSV
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from data.save_manager import SaveManager
+from level.level_manager import LevelManager
+from gameplay.student_code import run_student_code
+from gameplay.fixed_timestep import SIM_HZ
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MAX_TICKS = SIM_HZ * 60    # 1 phút thời gian game
+
+LEVEL_FILE_RE = re.compile(r"level[_-]?(\d+)", re.IGNORECASE)
+
+REPORT_FIELDS = [
+    "student",
+    "file",
+    "level",
+    "seed",
+    "status",
+    "reached_checkpoint",
+    "ticks",
+    "fruits_collected",
+    "deaths",
+    "error",
+]
+
+# ================= WORKER STATE =================
+# Mỗi process giữ 1 LevelManager headless, tái sử dụng cho mọi bài chấm
+_level_manager = None
+_control_modes = {}
+
+
+def load_control_modes(path="data/levels_config.json"):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {int(k): v.get("control_mode", "code") for k, v in data.items()}
+
+
+def _init_worker():
+    global _level_manager, _control_modes
+    os.chdir(ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Giữ mọi level trong LRU: mỗi worker chấm lần lượt nhiều level
+        _level_manager = LevelManager(SaveManager(path=None), headless=True, level_cache_size=64)
+    _control_modes = load_control_modes()
+
+
+# ================= GRADING =================
+def grade_solution(task):
+    student, path, level_id, max_ticks, seed = task
+    # Mặc định seed = ID level: mọi học viên cùng 1 nhiệm vụ trái cây, chạy song song không ảnh hưởng nhau
+    if seed is None:
+        seed = level_id
+    row = {
+        "student": student,
+        "file": path,
+        "level": level_id,
+        "seed": seed,
+        "status": "",
+        "reached_checkpoint": False,
+        "ticks": 0,
+        "fruits_collected": 0,
+        "deaths": 0,
+        "error": "",
+    }
+
+    lm = _level_manager
+    if level_id not in lm.levels:
+        row["status"] = "no_level"
+        return row
+
+    if _control_modes.get(level_id) == "keyboard":
+        row["status"] = "keyboard_level"
+        return row
+
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            code = f.read()
+    except OSError as e:
+        row["status"] = "error"
+        row["error"] = str(e)
+        return row
+
+    # Giống CodePanel: giữ cả dòng trống để số dòng trong thông báo lỗi khớp với editor
+    lines = code.splitlines()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        lm.load_level(level_id, seed=seed)
+        row["seed"] = lm.level_seed   # seed thực dùng (đã đưa về 32 bit), khớp với replay
+        fruits_before = lm.item_manager.total_fruits()
+
+        try:
+            run_student_code(lm.player, lines)
+        except Exception as e:
+            row["status"] = "error"
+            row["error"] = f"{type(e).__name__}: {e}"
+            return row
+
+        status, ticks = lm.fast_forward(max_ticks)
+
+    error = lm.player.code_error
+    if error is not None:
+        # Lỗi khi chạy (vd chia cho 0, chương trình quá dài): vẫn ghi lại số tick / trạng thái lúc dừng
+        row["error"] = f"{type(error).__name__}: {error}"
+
+    row["status"] = status
+    row["reached_checkpoint"] = status == "reached"
+    row["ticks"] = ticks
+    row["fruits_collected"] = lm.item_manager.total_fruits() - fruits_before
+    row["deaths"] = lm.player.deaths
+    return row
+
+
+# ================= DISCOVERY =================
+def discover_tasks(solutions_dir, level_ids, max_ticks, seed=None):
+    tasks = []
+    for dirpath, dirnames, filenames in os.walk(solutions_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.endswith(".py"):
+                continue
+
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, solutions_dir)
+            parts = rel.split(os.sep)
+            student = parts[0] if len(parts) > 1 else os.path.splitext(name)[0]
+
+            # File tên "levelN.py" chỉ chấm cho level N
+            match = LEVEL_FILE_RE.search(name)
+            if match:
+                file_level = int(match.group(1))
+                targets = [file_level] if file_level in level_ids else []
+            else:
+                targets = level_ids
+
+            for level_id in targets:
+                tasks.append((student, path, level_id, max_ticks, seed))
+    return tasks
+
+
+# ================= REPORT =================
+def write_report(rows, out_path):
+    if out_path and out_path.lower().endswith(".json"):
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=4, ensure_ascii=False)
+        return
+
+    f = open(out_path, "w", newline="", encoding="utf-8") if out_path else sys.stdout
+    try:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if out_path:
+            f.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Chấm bài tự động các lời giải level code của Code Fruit (headless)."
+    )
+    parser.add_argument("solutions", help="thư mục chứa file lời giải .py")
+    parser.add_argument("--levels", type=int, nargs="+", required=True, help="ID các level cần chấm")
+    parser.add_argument("--out", default=None, help="file báo cáo (.csv hoặc .json), mặc định in CSV ra stdout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="số process chấm song song")
+    parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS, help="số tick mô phỏng tối đa cho mỗi bài")
+    parser.add_argument("--seed", type=int, default=None, help="seed RNG của level (mặc định: ID level)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    solutions_dir = os.path.abspath(args.solutions)
+    out_path = os.path.abspath(args.out) if args.out else None
+    if not os.path.isdir(solutions_dir):
+        print(f"[grade] Không tìm thấy thư mục: {solutions_dir}", file=sys.stderr)
+        return 1
+
+    tasks = discover_tasks(solutions_dir, args.levels, args.max_ticks, args.seed)
+    if not tasks:
+        print("[grade] Không có bài nào để chấm.", file=sys.stderr)
+        return 1
+
+    print(f"[grade] {len(tasks)} bài, {args.workers} process", file=sys.stderr)
+
+    os.chdir(ROOT)
+    chunksize = max(1, len(tasks) // (args.workers * 4))
+    with multiprocessing.Pool(processes=max(1, args.workers), initializer=_init_worker) as pool:
+        rows = []
+        for i, row in enumerate(pool.imap(grade_solution, tasks, chunksize=chunksize), 1):
+            rows.append(row)
+            if i % 50 == 0 or i == len(tasks):
+                print(f"[grade] {i}/{len(tasks)}", file=sys.stderr)
+
+    for row in rows:
+        row["file"] = os.path.relpath(row["file"], solutions_dir)
+
+    write_report(rows, out_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
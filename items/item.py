@@ -1,27 +1,30 @@
 import os
 import pygame
-from player.animation import Animation
+from gameplay.asset_cache import load_animation
 
 
 class Item:
     SIZE = 32
     BASE_PATH = "assets/Items/Fruits"
 
-    def __init__(self, x, y, name):
+    def __init__(self, x, y, name, headless=False):
         self.name = name
 
         self.rect = pygame.Rect(x, y, self.SIZE, self.SIZE)
 
-        idle_img = self._load_image(f"{name}.png")
-        collect_img = self._load_image("Collected.png")
-
-        self.anim_idle = Animation(idle_img, self.SIZE, self.SIZE, 0.3)
-        self.anim_collect = Animation(
-            collect_img,
+        # Frame dùng chung cho mọi quả cùng loại (asset cache)
+        self.anim_idle = load_animation(
+            os.path.join(self.BASE_PATH, f"{name}.png"),
+            self.SIZE, self.SIZE, 0.3,
+            headless=headless
+        )
+        self.anim_collect = load_animation(
+            os.path.join(self.BASE_PATH, "Collected.png"),
             self.SIZE,
             self.SIZE,
             0.2,
-            loop=False
+            loop=False,
+            headless=headless
         )
 
         self.current_anim = self.anim_idle
@@ -29,11 +32,6 @@ class Item:
         self.dead = False
 
     # ================= CORE =================
-    def _load_image(self, filename):
-        return pygame.image.load(
-            os.path.join(self.BASE_PATH, filename)
-        ).convert_alpha()
-
     def collect(self):
         if self.collected:
             return
@@ -48,6 +46,10 @@ class Item:
         if self.collected and self.current_anim.finished:
             self.dead = True
 
+    def get_sprite(self):
+        img = self.current_anim.get_image()
+        return img, False, img.get_rect(topleft=self.rect.topleft)
+
     def draw(self, surf):
         surf.blit(
             self.current_anim.get_image(),
@@ -14,11 +14,16 @@ class ItemManager:
         "Strawberry",
     )
 
-    def __init__(self):
+    def __init__(self, headless=False, rng=None):
         self.items: list[Item] = []
+        self.headless = headless
+        # RNG của level hiện tại (LevelManager gán lại mỗi lần load level) -> phạt trái cây tất định
+        self.rng = rng or random.Random()
 
         self.count = {name: 0 for name in self.FRUIT_TYPES}
         self.discovered = {name: False for name in self.FRUIT_TYPES}
+        # Tăng mỗi lần count / discovered đổi -> HUD chỉ render lại số trái cây khi cần
+        self.version = 0
 
     # ================= LEVEL =================
     def clear_level_items(self):
@@ -26,7 +31,7 @@ class ItemManager:
 
     def add(self, x, y, name):
         if name in self.count:
-            self.items.append(Item(x, y, name))
+            self.items.append(Item(x, y, name, headless=self.headless))
 
     # ================= UPDATE =================
     def update(self, player, save_manager=None, objective=None):
@@ -43,6 +48,7 @@ class ItemManager:
 
         self.count[item.name] += 1
         self.discovered[item.name] = True
+        self.version += 1
 
         if objective:
             objective.add(item.name, 1)
@@ -78,6 +84,8 @@ class ItemManager:
                 self.count[name] = data.get(name, 0)
                 self.discovered[name] = data.get(name, 0) > 0
 
+        self.version += 1
+
 
     # ================= PENALTY =================
     def punish_random_type(self, percent=0.1):
@@ -85,9 +93,10 @@ class ItemManager:
         if not available:
             return
 
-        fruit = random.choice(available)
+        fruit = self.rng.choice(available)
         lost = max(1, int(self.count[fruit] * percent))
         self.count[fruit] = max(0, self.count[fruit] - lost)
+        self.version += 1
 
     # ================= SHOP SUPPORT ===================
 
@@ -112,3 +121,5 @@ class ItemManager:
             take = min(have, amount)
             self.count[name] -= take
             amount -= take
+
+        self.version += 1
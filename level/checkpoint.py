@@ -1,6 +1,8 @@
 import pygame
 import os
 
+from gameplay.asset_cache import load_frames, load_image
+
 class Checkpoint:
     SIZE = 64
 
@@ -10,17 +12,21 @@ class Checkpoint:
     STATE_ACTIVATING = "ACTIVATING" # Đang kéo cờ lên (Animation)
     STATE_ACTIVE = "ACTIVE"       # Cờ đã bay phấp phới (Đã qua màn)
 
-    def __init__(self, x, y):
+    def __init__(self, x, y, headless=False):
         # Tạo khung va chạm
         self.rect = pygame.Rect(x, y, self.SIZE, self.SIZE)
+        self.headless = headless
 
         base = "assets/Checkpoints/Checkpoint"
 
         # Load hình ảnh
         # 1. Hình cột cờ trống
-        self.no_flag = pygame.image.load(
-            os.path.join(base, "Checkpoint (No Flag).png")
-        ).convert_alpha()
+        if headless:
+            self.no_flag = None
+        else:
+            self.no_flag = load_image(
+                os.path.join(base, "Checkpoint (No Flag).png")
+            )
 
         # 2. Animation cờ bay (Idle)
         self.idle_frames = self._load_sheet(
@@ -56,16 +62,9 @@ class Checkpoint:
             # Trả về mảng chứa 1 surface rỗng để tránh crash
             return [pygame.Surface((self.SIZE, self.SIZE), pygame.SRCALPHA)]
 
-        sheet = pygame.image.load(path).convert_alpha()
-        frames = []
-        sheet_w = sheet.get_width()
-        
-        # Cắt theo chiều ngang, mỗi khung hình kích thước SIZE x SIZE
-        for x in range(0, sheet_w, self.SIZE):
-            frame = sheet.subsurface((x, 0, self.SIZE, self.SIZE))
-            frames.append(frame)
-
-        return frames
+        # Cắt theo chiều ngang, mỗi khung hình kích thước SIZE x SIZE (dùng chung qua asset cache)
+        # Headless: chỉ cần số frame để animation kéo cờ kết thúc đúng thời điểm
+        return load_frames(path, self.SIZE, self.SIZE, headless=self.headless)
 
     # ==================================================
     # PUBLIC API (GỌI TỪ LEVEL MANAGER)
@@ -138,8 +137,11 @@ class Checkpoint:
                     self._finished = True
 
                     # Gửi sự kiện chuyển màn (nếu cần dùng event system)
+                    # Headless không có event queue -> chỉ reset cờ hiệu
                     if self.pending_next_level:
                         self.pending_next_level = False
+                        if self.headless:
+                            return
                         pygame.event.post(
                             pygame.event.Event(
                                 pygame.USEREVENT, 
@@ -157,13 +159,22 @@ class Checkpoint:
     # ==================================================
     # DRAW
     # ==================================================
-    def draw(self, surf):
+    def get_sprite(self):
+        """(frame, lật ngang, rect) đang hiển thị"""
         # Nếu chưa kích hoạt hoặc đang chờ xem nhiệm vụ -> Vẽ cột cờ không cờ
         if self.state in (self.STATE_IDLE, self.STATE_WAIT):
-            surf.blit(self.no_flag, self.rect.topleft)
-        
+            img = self.no_flag
+
         # Nếu đang kích hoạt hoặc đã xong -> Vẽ animation
+        # Kiểm tra an toàn để không bị lỗi index out of range
+        elif self.frame_index < len(self.frames):
+            img = self.frames[self.frame_index]
         else:
-            # Kiểm tra an toàn để không bị lỗi index out of range
-            if self.frame_index < len(self.frames):
-                surf.blit(self.frames[self.frame_index], self.rect.topleft)
\ No newline at end of file
+            return None
+
+        return img, False, img.get_rect(topleft=self.rect.topleft)
+
+    def draw(self, surf):
+        sprite = self.get_sprite()
+        if sprite is not None:
+            surf.blit(sprite[0], sprite[2])
\ No newline at end of file
@@ -0,0 +1,84 @@
+class CollisionGrid:
+    """
+    Lưới đều (spatial hash) chỉ mục các rect va chạm tĩnh của level.
+    Xây 1 lần khi load level, mỗi frame player chỉ lấy các rect nằm trong
+    những ô mà vùng di chuyển của nó chạm tới.
+    """
+
+    # Map nhỏ: duyệt thẳng danh sách còn nhanh hơn tra lưới
+    LINEAR_THRESHOLD = 24
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.rects = []
+        self.cells = {}        # (cx, cy) -> [index trong self.rects]
+        self.cell_rects = {}   # (cx, cy) -> [rect] (cùng thứ tự với self.cells)
+        self.linear = True     # True -> query() trả thẳng toàn bộ danh sách
+
+    # ================= BUILD =================
+    def clear(self):
+        self.rects = []
+        self.cells.clear()
+        self.cell_rects.clear()
+        self.linear = True
+
+    def build(self, rects):
+        self.clear()
+        for rect in rects:
+            self.insert(rect)
+
+    def insert(self, rect):
+        index = len(self.rects)
+        self.rects.append(rect)
+        self.linear = len(self.rects) <= self.LINEAR_THRESHOLD
+
+        x0, y0, x1, y1 = self._cell_range(rect)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+                self.cell_rects.setdefault((cx, cy), []).append(rect)
+
+    # ================= QUERY =================
+    def query(self, area):
+        """Các rect có thể chạm vào `area`, giữ nguyên thứ tự như trong map"""
+        if self.linear:
+            return self.rects
+
+        x0, y0, x1, y1 = self._cell_range(area)
+
+        # Trường hợp phổ biến: vùng nằm gọn trong 1 ô
+        if x0 == x1 and y0 == y1:
+            return self.cell_rects.get((x0, y0), ())
+
+        buckets = []
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    buckets.append((cx, cy))
+
+        if not buckets:
+            return ()
+        if len(buckets) == 1:
+            return self.cell_rects[buckets[0]]
+
+        found = set()
+        for key in buckets:
+            found.update(self.cells[key])
+        return [self.rects[i] for i in sorted(found)]
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (
+            rect.left // size,
+            rect.top // size,
+            (rect.right - 1) // size,
+            (rect.bottom - 1) // size,
+        )
+
+    # ================= HELPERS =================
+    def __iter__(self):
+        return iter(self.rects)
+
+    def __len__(self):
+        return len(self.rects)
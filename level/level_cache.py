@@ -0,0 +1,329 @@
+# level/level_cache.py
+#
+# "Nướng" sẵn level: mỗi assets/levels/levelN.tmx được chuyển thành 1 file nhị phân gọn
+# (map surface dạng pixel thô, mảng rect Collision / OneWay, danh sách spawn object).
+# LevelManager.load_level memory-map file này thay vì parse TMX + blit lại từng tile.
+# File tự build lại khi TMX / tileset thay đổi (so khớp chữ ký mtime + size).
+#
+# Build trước toàn bộ level:
+#   python -m level.level_cache
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import OrderedDict
+
+import pygame
+
+BAKED_DIR = ".baked"
+MAGIC = b"CFLV"
+VERSION = 1
+
+# magic, version, signature(sha1), tile w/h, map w/h, số collision, số one-way,
+# độ dài JSON spawn, độ dài pixel (0 nếu không có)
+_HEADER = struct.Struct("<4sH20sHHIIIIIQ")
+_RECT = struct.Struct("<iiii")
+
+_TILESET_RE = re.compile(r'<tileset[^>]*\ssource="([^"]+)"')
+_IMAGE_RE = re.compile(r'<image[^>]*\ssource="([^"]+)"')
+
+
+class SpawnInfo:
+    """1 object trong TMX (Player, Checkpoint, Enemy, trái cây...) ở dạng gọn, không phụ thuộc pytmx"""
+    __slots__ = ("name", "type", "x", "y", "width", "height", "properties")
+
+    def __init__(self, name, type, x, y, width, height, properties=None):
+        self.name = name
+        self.type = type
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.properties = properties or {}
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class LevelData:
+    """Phần tĩnh của 1 level: kích thước, map surface, rect va chạm, danh sách spawn"""
+
+    def __init__(self, tile_w, tile_h, map_w, map_h, map_surface, collisions, one_way, spawns):
+        self.tile_w = tile_w
+        self.tile_h = tile_h
+        self.map_w = map_w
+        self.map_h = map_h
+        self.map_surface = map_surface
+        self.collisions = collisions
+        self.one_way = one_way
+        self.spawns = spawns
+
+
+class CachedLevel:
+    """Những gì LevelManager giữ lại giữa các lần load cùng 1 level (không chứa entity)"""
+
+    def __init__(self, data, bg, collision_grid, one_way_grid):
+        self.data = data
+        self.bg = bg
+        self.collision_grid = collision_grid
+        self.one_way_grid = one_way_grid
+
+
+class LevelLRU:
+    """
+    LRU trong RAM các level vừa chơi (phần tĩnh đã load xong).
+    RESTART / chơi lại màn vừa chơi không phải đọc lại từ đĩa. maxsize=0 -> tắt cache.
+    """
+
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ==================================================
+# SIGNATURE
+# ==================================================
+def _dependencies(tmx_path):
+    """TMX + các tileset (.tsx) + ảnh tileset mà nó tham chiếu"""
+    paths = [tmx_path]
+    try:
+        with open(tmx_path, "r", encoding="utf-8") as f:
+            tmx_text = f.read()
+    except OSError:
+        return paths
+
+    base = os.path.dirname(tmx_path)
+    for tsx in _TILESET_RE.findall(tmx_text):
+        tsx_path = os.path.normpath(os.path.join(base, tsx))
+        paths.append(tsx_path)
+        try:
+            with open(tsx_path, "r", encoding="utf-8") as f:
+                tsx_text = f.read()
+        except OSError:
+            continue
+        for img in _IMAGE_RE.findall(tsx_text):
+            paths.append(os.path.normpath(os.path.join(os.path.dirname(tsx_path), img)))
+
+    for img in _IMAGE_RE.findall(tmx_text):
+        paths.append(os.path.normpath(os.path.join(base, img)))
+    return paths
+
+
+def source_signature(tmx_path):
+    digest = hashlib.sha1()
+    for path in _dependencies(tmx_path):
+        try:
+            st = os.stat(path)
+            digest.update(f"{path}|{st.st_mtime_ns}|{st.st_size}\n".encode("utf-8"))
+        except OSError:
+            digest.update(f"{path}|missing\n".encode("utf-8"))
+    return digest.digest()
+
+
+def artifact_path(tmx_path):
+    folder = os.path.join(os.path.dirname(tmx_path), BAKED_DIR)
+    name = os.path.splitext(os.path.basename(tmx_path))[0] + ".bin"
+    return os.path.join(folder, name)
+
+
+# ==================================================
+# PARSE TMX (CHẬM - CHỈ KHI CHƯA CÓ ARTIFACT)
+# ==================================================
+def parse_tmx(tmx_path, headless=False):
+    from pytmx import TiledMap, TiledTileLayer
+    from pytmx.util_pygame import load_pygame
+
+    # Headless: chỉ đọc dữ liệu, không load ảnh tile
+    tmx = TiledMap(tmx_path) if headless else load_pygame(tmx_path)
+
+    tw = tmx.tilewidth
+    th = tmx.tileheight
+    map_w = tmx.width * tw
+    map_h = tmx.height * th
+
+    map_surface = None
+    if not headless:
+        map_surface = pygame.Surface((map_w, map_h), pygame.SRCALPHA)
+        for layer in tmx.visible_layers:
+            if isinstance(layer, TiledTileLayer):
+                for x, y, image in layer.tiles():
+                    if image:
+                        map_surface.blit(image, (x * tw, y * th))
+
+    collisions = []
+    one_way = []
+    spawns = []
+    for obj in tmx.objects:
+        if obj.name == "Collision":
+            collisions.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+        elif obj.name == "OneWay":
+            one_way.append(pygame.Rect(obj.x, obj.y, obj.width, obj.height))
+        else:
+            spawns.append(SpawnInfo(
+                obj.name, getattr(obj, "type", None),
+                obj.x, obj.y, obj.width, obj.height,
+                dict(obj.properties)
+            ))
+
+    return LevelData(tw, th, map_w, map_h, map_surface, collisions, one_way, spawns)
+
+
+# ==================================================
+# READ / WRITE ARTIFACT
+# ==================================================
+def write_artifact(path, signature, data):
+    spawn_json = json.dumps(
+        [s.to_dict() for s in data.spawns], ensure_ascii=False, default=str
+    ).encode("utf-8")
+
+    pixels = b""
+    if data.map_surface is not None:
+        pixels = pygame.image.tobytes(data.map_surface, "RGBA")
+
+    header = _HEADER.pack(
+        MAGIC, VERSION, signature,
+        data.tile_w, data.tile_h, data.map_w, data.map_h,
+        len(data.collisions), len(data.one_way),
+        len(spawn_json), len(pixels)
+    )
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for rect in data.collisions + data.one_way:
+            f.write(_RECT.pack(rect.x, rect.y, rect.w, rect.h))
+        f.write(spawn_json)
+        f.write(pixels)
+    os.replace(tmp_path, path)
+
+
+def read_artifact(path, signature, load_pixels=True):
+    """Trả về LevelData, hoặc None nếu artifact chưa có / cũ / hỏng"""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if len(mm) < _HEADER.size:
+            return None
+
+        (magic, version, sig, tw, th, map_w, map_h,
+         n_coll, n_one_way, spawn_len, pixel_len) = _HEADER.unpack_from(mm, 0)
+
+        if magic != MAGIC or version != VERSION or sig != signature:
+            return None
+
+        offset = _HEADER.size
+        rects = []
+        for _ in range(n_coll + n_one_way):
+            rects.append(pygame.Rect(_RECT.unpack_from(mm, offset)))
+            offset += _RECT.size
+
+        spawns = [
+            SpawnInfo(**d) for d in json.loads(mm[offset:offset + spawn_len].decode("utf-8"))
+        ]
+        offset += spawn_len
+
+        map_surface = None
+        if load_pixels:
+            if pixel_len != map_w * map_h * 4:
+                return None
+            view = memoryview(mm)[offset:offset + pixel_len]
+            try:
+                raw = pygame.image.frombuffer(view, (map_w, map_h), "RGBA")
+                map_surface = raw.convert_alpha()
+                del raw
+            finally:
+                view.release()
+
+        return LevelData(
+            tw, th, map_w, map_h, map_surface,
+            rects[:n_coll], rects[n_coll:], spawns
+        )
+    except (struct.error, ValueError, TypeError, KeyError):
+        return None
+    finally:
+        mm.close()
+
+
+# ==================================================
+# PUBLIC API
+# ==================================================
+def load_level_data(tmx_path, headless=False):
+    """
+    Load phần tĩnh của level từ artifact nếu còn mới, nếu không thì parse TMX.
+    Bản có hình (không headless) sẽ ghi lại artifact cho lần load sau.
+    """
+    signature = source_signature(tmx_path)
+    path = artifact_path(tmx_path)
+
+    data = read_artifact(path, signature, load_pixels=not headless)
+    if data is not None:
+        return data
+
+    data = parse_tmx(tmx_path, headless=headless)
+    if not headless:
+        try:
+            write_artifact(path, signature, data)
+        except OSError as e:
+            print(f"[LevelCache] Không ghi được artifact {path}: {e}")
+    return data
+
+
+def bake_all(level_dir="assets/levels"):
+    """Build artifact cho mọi levelN.tmx (cần pygame display để convert tile)"""
+    names = sorted(
+        (f for f in os.listdir(level_dir) if re.fullmatch(r"level\d+\.tmx", f)),
+        key=lambda f: int(re.search(r"\d+", f).group())
+    )
+    for name in names:
+        tmx_path = os.path.join(level_dir, name)
+        signature = source_signature(tmx_path)
+        path = artifact_path(tmx_path)
+
+        if read_artifact(path, signature, load_pixels=False) is not None:
+            print(f"[LevelCache] {name}: up to date")
+            continue
+
+        write_artifact(path, signature, parse_tmx(tmx_path))
+        print(f"[LevelCache] {name}: baked -> {path}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    bake_all(sys.argv[1] if len(sys.argv) > 1 else "assets/levels")
@@ -1,25 +1,49 @@
 import os
 import random
+import time
 import pygame
 
-from pytmx.util_pygame import load_pygame
-from pytmx import TiledTileLayer
-
 from player.player import Player
 from items.item_manager import ItemManager
 from level.checkpoint import Checkpoint
 from level.level_state import LevelState
 from level.scrolling_background import ScrollingBackground
 from level.level_objective import LevelObjective
-from gameplay.code_runner import CodeRunner
+from level.collision_grid import CollisionGrid
+from level.level_cache import CachedLevel, LevelLRU, load_level_data
+from gameplay.student_code import run_student_code
+from gameplay.headless import headless_from_env
+from gameplay.fixed_timestep import SIM_DT, SIM_HZ
+from gameplay.replay import EXTENSION as REPLAY_EXTENSION, ReplayRecorder
 
 # ===== ENEMY =====
 from enemy.enemy_manager import EnemyManager
 
 class LevelManager:
-    def __init__(self, save):
+    # Entity nhảy xa hơn mức này trong 1 tick (respawn, teleport) -> vẽ thẳng vị trí mới
+    INTERP_MAX_DIST = 48
+
+    # fast_forward: giới hạn tick mặc định (1 phút game) và số tick đứng yên coi như kết thúc
+    FAST_FORWARD_MAX_TICKS = SIM_HZ * 60
+    SETTLE_TICKS = 30
+
+    # Số file replay giữ lại trong replay_dir (xoá file cũ nhất)
+    REPLAY_KEEP = 50
+
+    def __init__(self, save, headless=None, level_cache_size=4, replay_dir=None):
         self.save = save
 
+        # ================= REPLAY =================
+        # replay_dir != None -> ghi lại mỗi lần chơi 1 level (gameplay/replay.py)
+        self.replay_dir = replay_dir
+        self.recorder = None
+        self.level_seed = 0
+        self.rng = random.Random()
+
+        # ================= HEADLESS =================
+        # Không load sprite / surface -> chạy được khi không có màn hình (chấm bài tự động)
+        self.headless = headless_from_env() if headless is None else headless
+
         # ================= REQUEST FLAGS =================
         self.request_go_home = False
         self.request_go_level_select = False
@@ -46,23 +70,27 @@ class LevelManager:
         self.current_level = 1
 
         # ================= MAP =================
-        self.tmx = None
+        self.level_data = None   # phần tĩnh của level (xem level/level_cache.py)
+        # LRU các level vừa chơi: RESTART chỉ tạo lại entity, không load lại map
+        self.level_lru = LevelLRU(level_cache_size)
         self.map_surface = None
         self.tw = self.th = 0
         self.map_w = self.map_h = 0
 
         # ================= OBJECTS =================
         self.player = None
-        self.code_runner = None
         self.checkpoint = None
         self.collisions = []
         self.one_way_platforms = []
+        # Lưới chỉ mục va chạm (xây lại mỗi lần load level)
+        self.collision_grid = CollisionGrid()
+        self.one_way_grid = CollisionGrid()
 
         # ================= ENEMY =================
-        self.enemy_manager = EnemyManager()
+        self.enemy_manager = EnemyManager(headless=self.headless)
 
         # ================= INVENTORY =================
-        self.item_manager = ItemManager()
+        self.item_manager = ItemManager(headless=self.headless)
         if not getattr(save, "_fruit_loaded", False):
             self.item_manager.import_data(save.get_fruits())
             save._fruit_loaded = True
@@ -85,6 +113,14 @@ class LevelManager:
         self.fade_alpha = 0
         self.fade_speed = 300
 
+        # Vị trí entity ở tick trước -> nội suy khi vẽ giữa 2 tick (fixed timestep)
+        self.prev_positions = {}
+
+        # Lượt chơi hiện tại (số tick PLAYING) -> thời gian tốt nhất / lịch sử chơi trong save
+        self.run_active = False
+        self.run_ticks = 0
+        self.run_completed = False
+
         # Khởi tạo level đầu tiên
         if self.levels:
             self.load_level(self.current_level)
@@ -107,6 +143,7 @@ class LevelManager:
 
     def on_quest_success(self):
         self.save.save_fruits(self.item_manager.export_data())
+        self.run_completed = True
         if self.checkpoint:
             self.checkpoint.activate()
             self.state = LevelState.CHECKPOINT_ANIM
@@ -118,23 +155,38 @@ class LevelManager:
         self.save.save_fruits(self.item_manager.export_data())
     
     def run_code(self, lines):
-        if not self.player or not self.code_runner:
+        if not self.player:
             return
-        self.code_runner.load(lines)
+        run_student_code(self.player, lines)
 
     # ==================================================
     # ================= LOAD LEVEL =====================
     # ==================================================
 
-    def load_level(self, level_id):
+    def load_level(self, level_id, seed=None):
+        """
+        seed: seed cho RNG của level (nhiệm vụ / phạt trái cây), None -> ngẫu nhiên; replay / chấm bài truyền vào.
+        Seed luôn được đưa về 32 bit không dấu (seed & 0xFFFFFFFF) vì header replay chỉ lưu uint32.
+        """
         if level_id not in self.levels:
             print(f"[ERROR] Level {level_id} not found!")
             return
 
         print(f"--- LOADING LEVEL {level_id} ---")
+        self.finish_recording()
+        self.finish_run()
         self.current_level = level_id
+        self.level_seed = (random.getrandbits(32) if seed is None else seed) & 0xFFFFFFFF
+        # RNG riêng của level: nhiệm vụ trái cây, phạt trái cây -> chạy song song / replay không ảnh hưởng nhau
+        self.rng = random.Random(self.level_seed)
+        self.objective.rng = self.rng
+        self.item_manager.rng = self.rng
         self.state = LevelState.PLAYING
         self.fade_alpha = 0
+        self.prev_positions = {}
+        self.run_active = True
+        self.run_ticks = 0
+        self.run_completed = False
 
         self.request_go_home = False
         self.request_go_level_select = False
@@ -145,16 +197,29 @@ class LevelManager:
         self.item_manager.clear_level_items() # Xóa item của màn trước
         self.enemy_manager.enemies.clear()
 
-        # Load file TMX
-        self.tmx = load_pygame(self.levels[level_id])
-
-        self.tw = self.tmx.tilewidth
-        self.th = self.tmx.tileheight
-        self.map_w = self.tmx.width * self.tw
-        self.map_h = self.tmx.height * self.th
-
-        self._load_background(level_id)
-        self._build_map_surface()
+        # Phần tĩnh của level (map, rect va chạm, spawn, background):
+        # lấy từ LRU nếu vừa chơi, nếu không thì load từ artifact / TMX
+        entry = self.level_lru.get(level_id)
+        if entry is None:
+            entry = self._load_static_level(level_id)
+            self.level_lru.put(level_id, entry)
+
+        data = entry.data
+        self.level_data = data
+
+        self.tw = data.tile_w
+        self.th = data.tile_h
+        self.map_w = data.map_w
+        self.map_h = data.map_h
+        self.map_surface = data.map_surface
+        self.collisions.extend(data.collisions)
+        self.one_way_platforms.extend(data.one_way)
+        self.collision_grid = entry.collision_grid
+        self.one_way_grid = entry.one_way_grid
+
+        self.bg = entry.bg
+        if self.bg:
+            self.bg.offset_y = 0
         
         # Load Objects (QUAN TRỌNG)
         self._load_objects()
@@ -162,50 +227,90 @@ class LevelManager:
         if not self.player:
             self.player = Player(
                 32, 32,
-                self.save.get_selected_character()
+                self.save.get_selected_character(),
+                headless=self.headless
             )
 
-        self.code_runner = CodeRunner(self.player)
-
-        if self.checkpoint and self.is_level_completed(level_id):
+        completed = self.is_level_completed(level_id)
+        if self.checkpoint and completed:
             self.checkpoint.force_active()
 
+        if self.replay_dir:
+            self.recorder = ReplayRecorder(
+                level_id, self.level_seed, self.save.get_selected_character(), completed
+            )
+            self.player.command_engine.recorder = self.recorder
+
+    def finish_recording(self):
+        """Lưu replay của lần chơi hiện tại (gọi khi đổi level / thoát game)"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None or recorder.ticks == 0:
+            return None
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        name = f"level{recorder.replay.level_id}_{stamp}_{recorder.replay.seed:08x}{REPLAY_EXTENSION}"
+        path = os.path.join(self.replay_dir, name)
+        try:
+            recorder.replay.save(path)
+            self._prune_replays()
+        except OSError as e:
+            print(f"[LevelManager] Không lưu được replay: {e}")
+            return None
+        return path
+
+    def finish_run(self):
+        """Ghi lượt chơi level hiện tại vào save (gọi khi qua màn / đổi level / thoát game)"""
+        if not self.run_active:
+            return
+        self.run_active = False
+        if self.run_ticks == 0:
+            return
+        self.save.record_run(self.current_level, self.level_seed, self.run_ticks, self.run_completed)
+
+    def _prune_replays(self):
+        paths = [
+            os.path.join(self.replay_dir, f)
+            for f in os.listdir(self.replay_dir) if f.endswith(REPLAY_EXTENSION)
+        ]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:-self.REPLAY_KEEP]:
+            os.remove(path)
+
 
     # ==================================================
     # ================= LOAD HELPERS ===================
     # ==================================================
 
-    def _load_background(self, seed):
+    def _load_static_level(self, level_id):
+        # Headless: chỉ đọc dữ liệu, không load ảnh tile / background
+        data = load_level_data(self.levels[level_id], headless=self.headless)
+
+        bg = None
+        if not self.headless:
+            bg = self._load_background(level_id, data.map_w, data.map_h)
+
+        # Xây lưới chỉ mục va chạm 1 lần cho cả level
+        collision_grid = CollisionGrid()
+        collision_grid.build(data.collisions)
+        one_way_grid = CollisionGrid()
+        one_way_grid.build(data.one_way)
+
+        return CachedLevel(data, bg, collision_grid, one_way_grid)
+
+    def _load_background(self, seed, map_w, map_h):
         if not self.bg_files:
-            self.bg = None
-            return
+            return None
 
-        random.seed(seed)
-        bg = random.choice(self.bg_files)
-        random.seed()
+        # Cùng 1 level luôn cùng background, không đụng tới RNG toàn cục
+        bg = random.Random(seed).choice(self.bg_files)
 
-        self.bg = ScrollingBackground(
+        return ScrollingBackground(
             os.path.join(self.bg_folder, bg),
-            self.map_w,
-            self.map_h,
+            map_w,
+            map_h,
             speed=40
         )
 
-    def _build_map_surface(self):
-        self.map_surface = pygame.Surface(
-            (self.map_w, self.map_h),
-            pygame.SRCALPHA
-        )
-
-        for layer in self.tmx.visible_layers:
-            if isinstance(layer, TiledTileLayer):
-                for x, y, image in layer.tiles():
-                    if image:
-                        self.map_surface.blit(
-                            image,
-                            (x * self.tw, y * self.th)
-                        )
-
     def _load_objects(self):
         # Biến đếm số lượng trái cây có trong map
         fruit_max = {}
@@ -218,25 +323,15 @@ class LevelManager:
 
         self.player = None
         self.checkpoint = None
-        tile_size = self.tmx.tilewidth
+        tile_size = self.tw
         character = self.save.get_selected_character()
 
-        for obj in self.tmx.objects:
+        for obj in self.level_data.spawns:
             if obj.name == "Player":
-                self.player = Player(obj.x, obj.y, character)
+                self.player = Player(obj.x, obj.y, character, headless=self.headless)
 
             elif obj.name == "Checkpoint":
-                self.checkpoint = Checkpoint(obj.x, obj.y)
-
-            elif obj.name == "Collision":
-                self.collisions.append(
-                    pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                )
-
-            elif obj.name == "OneWay":
-                self.one_way_platforms.append(
-                    pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                )
+                self.checkpoint = Checkpoint(obj.x, obj.y, headless=self.headless)
 
             elif obj.type == "Enemy":
                 self.enemy_manager.add(
@@ -258,15 +353,19 @@ class LevelManager:
                 if obj.name in valid_fruits:
                     fruit_max[obj.name] = fruit_max.get(obj.name, 0) + 1
 
-        # Gửi dữ liệu đếm được vào Objective để tạo nhiệm vụ
+        # Gửi dữ liệu đếm được vào Objective để tạo nhiệm vụ (theo RNG của level -> replay được)
         self.objective.generate(fruit_max)
 
     # ==================================================
     # ================= UPDATE =========================
     # ==================================================
 
-    def update(self, dt, keys):
-        if self.bg:
+    def update(self, dt, keys, scroll_bg=True):
+        """1 tick mô phỏng (dt = SIM_DT khi chạy theo fixed timestep)"""
+        if not self.headless:
+            self.prev_positions = {e: e.rect.topleft for e in self._entities()}
+
+        if self.bg and scroll_bg:
             self.bg.update(dt)
 
         if self.checkpoint:
@@ -275,6 +374,9 @@ class LevelManager:
         if self.quest_panel and self.quest_panel.visible:
             return
 
+        if self.recorder:
+            self.recorder.record_tick(self.state, keys)
+
         if self.state == LevelState.PLAYING:
             self._update_playing(dt, keys)
 
@@ -300,9 +402,46 @@ class LevelManager:
             )
             if self.fade_alpha <= 0:
                 self.state = LevelState.PLAYING
+
+    def fast_forward(self, max_ticks=None, keys=None):
+        """
+        Chạy liền nhiều tick (không vẽ) cho tới khi chương trình code có kết quả.
+        Trả về (status, số tick): "reached" (chạm cờ), "fell" (rơi khỏi map),
+        "finished" (hết lệnh và đứng yên), "timeout".
+        Dùng cho chế độ kết quả ngay (turbo) và công cụ chấm bài.
+        """
+        if max_ticks is None:
+            max_ticks = self.FAST_FORWARD_MAX_TICKS
+
+        player = self.player
+        idle_ticks = 0
+
+        for tick in range(1, max_ticks + 1):
+            self.update(SIM_DT, keys)
+
+            # Chạm cờ khi đã đủ trái cây -> qua màn
+            if self.state != LevelState.PLAYING:
+                return "reached", tick
+
+            # Rơi khỏi map -> không thể về đích nữa
+            if player.rect.top > self.map_h:
+                return "fell", tick
+
+            # Hết lệnh và nhân vật đã đứng yên -> chương trình kết thúc
+            # (ground_buffer thay vì on_ground: trên nền phẳng on_ground bật/tắt xen kẽ từng tick
+            # vì trọng lực < 1px chưa làm rect chạm đất)
+            if not player.code_active and player.ground_buffer > 0 and player.state == player.IDLE:
+                idle_ticks += 1
+                if idle_ticks >= self.SETTLE_TICKS:
+                    return "finished", tick
+            else:
+                idle_ticks = 0
+
+        return "timeout", max_ticks
+
     def _update_playing(self, dt, keys):
-            if self.code_runner:
-                self.code_runner.update()
+            if self.run_active and not self.run_completed:
+                self.run_ticks += 1
 
             keyboard_locked = (keys is None) or (self.player and self.player.code_active)
 
@@ -310,8 +449,8 @@ class LevelManager:
                 self.player.update(
                     dt,
                     None if keyboard_locked else keys,
-                    self.collisions,
-                    self.one_way_platforms
+                    self.collision_grid,
+                    self.one_way_grid
                 )
 
             self.enemy_manager.update(self.player)
@@ -334,6 +473,7 @@ class LevelManager:
                 
                 # TRƯỜNG HỢP 1: Đã gom đủ trái cây -> CHIẾN THẮNG
                 if is_completed:
+                    self.run_completed = True
                     self.checkpoint.activate()      # Kích hoạt animation cờ bay
                     self.state = LevelState.CHECKPOINT_ANIM # Chuyển state để chặn điều khiển và chờ animation
                     
@@ -352,12 +492,16 @@ class LevelManager:
 
     def _load_next_level(self):
         next_level = self.current_level + 1
+        self.finish_run()
         if next_level in self.levels:
             self.save.unlock_level(next_level)
+            # Qua màn: ghi save ngay thay vì đợi thread nền
+            self.save.flush()
             self.load_level(next_level)
             self.state = LevelState.FADING_IN
         else:
             print("All levels completed!")
+            self.save.flush()
             self.state = LevelState.PLAYING
             self.go_level_select()
 
@@ -365,21 +509,54 @@ class LevelManager:
     # ================= DRAW ===========================
     # ==================================================
 
-    def draw(self, surf):
+    def draw_static(self, surf):
+        """Lớp tĩnh: background + map (không đổi khi background không cuộn)"""
         if self.bg:
             self.bg.draw(surf)
 
         if self.map_surface:
             surf.blit(self.map_surface, (0, 0))
 
-        self.enemy_manager.draw(surf)
-        self.item_manager.draw(surf)
-
+    def _entities(self):
+        """Mọi entity theo đúng thứ tự vẽ"""
+        entities = [*self.enemy_manager.enemies, *self.item_manager.items]
         if self.checkpoint:
-            self.checkpoint.draw(surf)
-
+            entities.append(self.checkpoint)
         if self.player:
-            self.player.draw(surf)
+            entities.append(self.player)
+        return entities
+
+    def get_sprites(self, alpha=1.0):
+        """
+        (frame, lật ngang, rect) của mọi entity, đúng thứ tự vẽ.
+        alpha < 1: lùi rect về giữa vị trí tick trước và tick hiện tại (nội suy).
+        """
+        sprites = []
+        for entity in self._entities():
+            sprite = entity.get_sprite()
+            if sprite is None:
+                continue
+
+            prev = self.prev_positions.get(entity) if alpha < 1 else None
+            if prev is not None:
+                back = 1 - alpha
+                dx = entity.rect.x - prev[0]
+                dy = entity.rect.y - prev[1]
+                # Dịch chuyển tức thời (respawn, snap lưới) thì không nội suy
+                if abs(dx) + abs(dy) <= self.INTERP_MAX_DIST:
+                    frame, flip, rect = sprite
+                    sprite = frame, flip, rect.move(round(-dx * back), round(-dy * back))
+
+            sprites.append(sprite)
+        return sprites
+
+    def draw(self, surf, alpha=1.0):
+        self.draw_static(surf)
+
+        for frame, flip, rect in self.get_sprites(alpha):
+            if flip:
+                frame = pygame.transform.flip(frame, True, False)
+            surf.blit(frame, rect)
 
         if self.fade_alpha > 0:
             fade = pygame.Surface((self.map_w, self.map_h))
@@ -1,9 +1,11 @@
 import random
 
 class LevelObjective:
-    def __init__(self):
+    def __init__(self, rng=None):
         # Cấu trúc: {"Apple": {"required": 5, "collected": 0, "max_in_map": 10}, ...}
         self.objectives = {}
+        # RNG của level hiện tại (LevelManager gán lại mỗi lần load level)
+        self.rng = rng or random.Random()
 
     # ================= GENERATE =================
     def generate(self, fruit_counts_in_map):
@@ -11,7 +13,7 @@ class LevelObjective:
         for name, total_available in fruit_counts_in_map.items():
             if total_available > 0:
                 # Random yêu cầu từ 1 đến tổng số có trong map
-                req = random.randint(1, total_available)
+                req = self.rng.randint(1, total_available)
                 self.objectives[name] = {
                     "required": req,
                     "collected": 0,
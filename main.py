@@ -1,9 +1,13 @@
+import os
 import sys
 import pygame
 import traceback
 
 from data.save_manager import SaveManager
+from data.profile_store import ProfileStore, ProfileSaveManager
 from level.level_manager import LevelManager
+from gameplay.student_code import run_student_code
+from gameplay.fixed_timestep import FixedTimestep, SIM_DT
 
 from characters.character_manager import CharacterManager
 from characters.character_select import CharacterSelect
@@ -15,6 +19,7 @@ from ui.hud import HUD
 from ui.mission_panel import MissionPanel
 from ui.square_transition import SquareTransition
 from ui.code_panel import CodePanel
+from ui.level_renderer import DirtyLevelRenderer
 
 from audio.sound_manager import SoundManager
 
@@ -41,41 +46,17 @@ FPS = 60
 fullscreen = False
 windowed_size = (BASE_W, BASE_H)
 
-# ================= COMMAND CLASSES =================
-class CmdMove:
-    def __init__(self, direction):
-        self.direction = direction
-        self.target_x = 0
-
-    def start(self, player):
-        player.facing_right = (self.direction == 1)
-        player.vel_x = player.speed * self.direction
-        current_grid = round(player.rect.x / 32)
-        self.target_x = (current_grid + self.direction) * 32
-
-    def update(self, player):
-        if (self.direction == 1 and player.rect.x >= self.target_x) or \
-           (self.direction == -1 and player.rect.x <= self.target_x):
-            player.rect.x = self.target_x
-            player.vel_x = 0
-            return True
-        return False
-
-class CmdJump:
-    def start(self, player):
-        if player.on_ground or (player.skills.has("double_jump") and player.jump_count < 2):
-            player.vel_y = player.jump_force
-            player.jump_count += 1
-            player.on_ground = False
-
-    def update(self, player):
-        return True
-
 # ================= DATA =================
-save = SaveManager()
+# Máy dùng chung (phòng lab): CODEFRUIT_PROFILE=<tên học viên> -> save riêng trong data/profiles.db
+profile = os.environ.get("CODEFRUIT_PROFILE")
+if profile:
+    save = ProfileSaveManager(ProfileStore(), profile)
+else:
+    save = SaveManager()
 
 # ================= MANAGERS =================
-level_manager = LevelManager(save)
+# Mỗi lần chơi 1 level được ghi lại (gameplay/replay.py) để tái hiện lỗi học viên báo
+level_manager = LevelManager(save, replay_dir="data/replays")
 saved_fruits = save.get_fruits()
 level_manager.item_manager.import_data(saved_fruits)
 
@@ -95,8 +76,15 @@ level_select = LevelSelect(save)
 sound.play_music("assets/sounds/bgm.ogg")
 
 # World Surface
+# World luôn được fill kín màu nền trước khi vẽ -> không cần kênh alpha (blit/scale nhanh hơn)
+def make_world_surface(w, h):
+    return pygame.Surface((w, h)).convert()
+
 WORLD_W, WORLD_H = level_manager.map_w, level_manager.map_h
-world = pygame.Surface((WORLD_W, WORLD_H), pygame.SRCALPHA)
+world = make_world_surface(WORLD_W, WORLD_H)
+
+# Surface đích đã scale: chỉ cấp phát lại khi kích thước thay đổi (resize / F11 / đổi level)
+scaled_world = None
 
 # HUD & Panels
 hud = HUD(level_manager.item_manager)
@@ -107,6 +95,12 @@ code_panel = CodePanel(x_pos=BASE_W - PANEL_W, width=PANEL_W, height=BASE_H)
 
 transition = SquareTransition(screen.get_size())
 
+# Renderer dirty-rect cho lúc soạn code
+level_renderer = DirtyLevelRenderer()
+
+# Mô phỏng chạy theo tick cố định, tách khỏi tốc độ vẽ (30 FPS vẫn đúng tốc độ game)
+sim_clock = FixedTimestep()
+
 # ================= HELPER FUNCTIONS =================
 
 def handle_resize(w, h):
@@ -117,6 +111,7 @@ def handle_resize(w, h):
         screen = pygame.display.set_mode((w, h), pygame.RESIZABLE)
 
     transition.resize((w, h))
+    level_renderer.invalidate()
     level_select.on_resize(screen)
     
     # Cập nhật vị trí Code Panel luôn nằm bên phải
@@ -127,7 +122,8 @@ def handle_resize(w, h):
         available_game_w = w - PANEL_W
         mission_panel.on_resize(available_game_w, h)
 
-def draw_game_view():
+def get_game_view_rects():
+    """(vùng dành cho game bên TRÁI, vùng đặt world đã scale - căn giữa trong vùng đó)"""
     sw, sh = screen.get_size()
     
     # Khu vực hiển thị game: Từ 0 đến (Screen Width - Panel Width)
@@ -140,17 +136,43 @@ def draw_game_view():
         target_w = int(available_w)
         target_h = int(target_w * (WORLD_H / WORLD_W))
 
-    scaled = pygame.transform.scale(world, (target_w, target_h))
-    
-    # Vẽ nền đen cho khu vực game (Bên TRÁI)
-    game_view_rect = pygame.Rect(0, 0, available_w, sh)
-    pygame.draw.rect(screen, (20, 20, 25), game_view_rect)
-    
     # Căn giữa game trong khu vực bên trái
     draw_x = (available_w - target_w) // 2
     draw_y = (sh - target_h) // 2
+
+    return pygame.Rect(0, 0, available_w, sh), pygame.Rect(draw_x, draw_y, target_w, target_h)
+
+def draw_game_view():
+    global scaled_world
+    game_view_rect, target_rect = get_game_view_rects()
+
+    if scaled_world is None or scaled_world.get_size() != target_rect.size:
+        scaled_world = make_world_surface(*target_rect.size)
+    pygame.transform.scale(world, target_rect.size, scaled_world)
+    
+    # Vẽ nền đen cho khu vực game (Bên TRÁI)
+    pygame.draw.rect(screen, (20, 20, 25), game_view_rect)
     
-    screen.blit(scaled, (draw_x, draw_y))
+    screen.blit(scaled_world, target_rect)
+
+def draw_level_dirty(dt):
+    """
+    Vẽ LEVEL_CODE chỉ ở vùng thay đổi: sprite đổi frame / vị trí, HUD, Mission, Code Panel.
+    Lớp background + map đã được ghép sẵn trong level_renderer.
+    """
+    game_view_rect, target_rect = get_game_view_rects()
+    rects = level_renderer.draw(
+        screen, level_manager, game_view_rect, target_rect, alpha=sim_clock.alpha
+    )
+
+    hud.draw(screen, dt, right_margin=PANEL_W)
+    mission_panel.draw(screen)
+    rects += level_renderer.end_frame([hud.drawn_rect, hud.settings_drawn_rect, mission_panel.drawn_rect])
+
+    code_panel.draw(screen)
+    rects.append(pygame.Rect(code_panel.x, 0, code_panel.width, code_panel.height))
+
+    pygame.display.update(rects)
 
 # ================= MAIN LOOP =================
 running = True
@@ -212,31 +234,19 @@ while running:
                 # Nếu Code Panel trả về danh sách lệnh -> Chạy Code
                 if isinstance(result, list): 
                     print("--- START CODE ---")
-                    player = level_manager.player
-                    player.reset_code_state()
-                    
-                    def api_move_right(steps=1):
-                        for _ in range(steps): player.enqueue_command(CmdMove(1))
-                    def api_move_left(steps=1):
-                        for _ in range(steps): player.enqueue_command(CmdMove(-1))
-                    def api_jump():
-                        player.enqueue_command(CmdJump())
-
-                    execution_env = {
-                        "move_right": api_move_right,
-                        "move_left": api_move_left,
-                        "jump": api_jump,
-                        "range": range,
-                        "print": print
-                    }
-                    
-                    code_str = "\n".join(result)
                     try:
-                        exec(code_str, {}, execution_env)
+                        run_student_code(level_manager.player, result)
                         state = GameState.LEVEL_PLAY 
+
+                        # Chế độ INSTANT: chạy hết chương trình ngay (không vẽ), chỉ hiện kết quả cuối
+                        if code_panel.instant:
+                            status, ticks = level_manager.fast_forward()
+                            sim_clock.reset()
+                            print(f"[Turbo] Instant: {status} sau {ticks} tick")
                     except Exception as e:
                         print(f"Error executing code: {e}")
                         traceback.print_exc()
+                        code_panel.show_status(str(e))
                 
                 # 3. QUAN TRỌNG: Nếu không click vào Code Panel, kiểm tra HUD (Nút Setting)
                 elif result is None:
@@ -269,7 +279,7 @@ while running:
                 panel_res = code_panel.handle_event(event)
                 # Chỉ chuyển về chế độ soạn thảo (Code) khi click chuột VÀ
                 # Level hiện tại KHÔNG phải là chế độ Keyboard
-                if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.type == pygame.MOUSEBUTTONDOWN and panel_res != "SPEED":
                     if code_panel.control_mode != "keyboard":
                         state = GameState.LEVEL_CODE
                         level_manager.player.reset_code_state()
@@ -313,7 +323,21 @@ while running:
                 if pygame.key.get_focused():
                     player_keys = pygame.key.get_pressed()
         
-        level_manager.update(dt, player_keys)
+        # Chạy đủ số tick cho thời gian thực vừa trôi qua
+        steps = sim_clock.advance(dt)
+        # Turbo: code học viên đang chạy -> nhiều tick mỗi frame (1x / 4x / 16x)
+        if state == GameState.LEVEL_PLAY and level_manager.player.code_active:
+            steps *= code_panel.ticks_per_frame
+
+        # Lúc soạn code background đứng yên để phần game gần như tĩnh (dirty-rect)
+        for _ in range(steps):
+            level_manager.update(SIM_DT, player_keys, scroll_bg=(state == GameState.LEVEL_PLAY))
+
+        # Code học viên dừng vì lỗi / quá dài -> báo lên CodePanel
+        code_error = level_manager.player.code_error
+        if code_error is not None:
+            code_panel.show_status(str(code_error))
+            level_manager.player.code_error = None
         mission_panel.update(dt)
         code_panel.update(dt)
 
@@ -332,8 +356,9 @@ while running:
         state = next_state
         if (state == GameState.LEVEL_CODE or state == GameState.LEVEL_PLAY) and next_level:
             level_manager.load_level(next_level)
+            sim_clock.reset()
             WORLD_W, WORLD_H = level_manager.map_w, level_manager.map_h
-            world = pygame.Surface((WORLD_W, WORLD_H), pygame.SRCALPHA)
+            world = make_world_surface(WORLD_W, WORLD_H)
 
             hud = HUD(level_manager.item_manager)
             
@@ -357,6 +382,17 @@ while running:
         transition.start_open()
 
     # ================= DRAW =================
+    # Đang soạn code và không có hiệu ứng phủ màn hình -> chỉ cập nhật vùng thay đổi
+    if (
+        state == GameState.LEVEL_CODE
+        and not transition.is_active()
+        and level_manager.fade_alpha <= 0
+        and not code_panel.show_hint
+    ):
+        draw_level_dirty(dt)
+        continue
+
+    level_renderer.invalidate()
     screen.fill((0, 0, 0))
 
     if state == GameState.MENU:
@@ -369,7 +405,7 @@ while running:
         level_select.draw(screen, dt)
     elif state in (GameState.LEVEL_CODE, GameState.LEVEL_PLAY):
         world.fill((20, 20, 25))
-        level_manager.draw(world)
+        level_manager.draw(world, alpha=sim_clock.alpha)
         
         draw_game_view() # Vẽ Game bên TRÁI
         
@@ -383,5 +419,8 @@ while running:
     transition.draw(screen)
     pygame.display.flip()
 
+level_manager.finish_recording()
+level_manager.finish_run()
+save.close()
 pygame.quit()
 sys.exit()
\ No newline at end of file
@@ -1,10 +1,24 @@
 import pygame
 class Animation:
     def __init__(self, sheet, frame_w, frame_h, speed, loop=True):
-        self.frames = [
+        frames = [
             sheet.subsurface((x, 0, frame_w, frame_h))
             for x in range(0, sheet.get_width(), frame_w)
         ]
+        self._setup(frames, speed, loop)
+
+    @classmethod
+    def from_frames(cls, frames, speed, loop=True):
+        """
+        Tạo Animation từ danh sách frame có sẵn (frame có thể là None ở chế độ headless).
+        Danh sách frame có thể dùng chung giữa nhiều Animation (chỉ đọc).
+        """
+        anim = cls.__new__(cls)
+        anim._setup(frames, speed, loop)
+        return anim
+
+    def _setup(self, frames, speed, loop):
+        self.frames = frames
 
         self.speed = speed
         self.loop = loop
@@ -1,6 +1,37 @@
 # player/commands.py
+#
+# Engine lệnh duy nhất của Player (code học viên, replay...):
+# - Registry: tên lệnh -> class (move / jump / wait). Thêm lệnh mới = 1 class + @register_command.
+# - Lệnh được yêu cầu dưới dạng (tên, tham số); CommandEngine lấy object từ pool, start/update,
+#   xong thì trả lại pool -> chạy hàng nghìn bước không tạo rác.
+# - Nguồn lệnh: hàng đợi (enqueue) hoặc chương trình (CodeVM: next_command() trả yêu cầu dần dần).
+#   Replay (gameplay/replay.py) ghi lại các yêu cầu này và phát lại qua đúng đường dispatch đó.
+
+from collections import deque
+
+from gameplay.fixed_timestep import SIM_DT
+
+GRID = 32   # 1 bước = 1 ô 32px
+
+COMMAND_TYPES = {}
+
+
+def register_command(name):
+    """Decorator: đăng ký class lệnh dưới tên `name`"""
+    def wrap(cls):
+        cls.name = name
+        COMMAND_TYPES[name] = cls
+        return cls
+    return wrap
+
 
 class BaseCommand:
+    name = None
+
+    def reset(self, *args):
+        """Gán tham số khi lấy object từ pool"""
+        pass
+
     def start(self, player):
         pass
 
@@ -9,59 +40,164 @@ class BaseCommand:
 
 
 # ================= MOVE =================
+@register_command("move")
 class MoveCommand(BaseCommand):
-    def __init__(self, direction, steps):
-        self.direction = direction          # "left" | "right"
-        self.steps = max(1, steps)
-        self.step_size = 32                 # 1 bước = 32px
-        self.moved = 0
-        self.started = False
+    """Đi đúng 1 ô theo direction (1: phải, -1: trái), dừng khớp lưới"""
+
+    def reset(self, direction):
+        self.direction = direction
+        self.target_x = 0
 
     def start(self, player):
-        if self.direction == "right":
-            player.facing_right = True
-            player.vel_x = player.speed
-        else:
-            player.facing_right = False
-            player.vel_x = -player.speed
-        self.started = True
+        player.facing_right = (self.direction == 1)
+        player.vel_x = player.speed * self.direction
+        current_grid = round(player.rect.x / GRID)
+        self.target_x = (current_grid + self.direction) * GRID
 
     def update(self, player):
-        # tích lũy quãng đường đã đi
-        self.moved += abs(player.vel_x)
-
-        if self.moved >= self.steps * self.step_size:
+        if (self.direction == 1 and player.rect.x >= self.target_x) or \
+           (self.direction == -1 and player.rect.x <= self.target_x):
+            player.rect.x = self.target_x
             player.vel_x = 0
             return True
-
         return False
 
 
 # ================= JUMP =================
+@register_command("jump")
 class JumpCommand(BaseCommand):
-    def __init__(self):
-        self.done = False
+    """Nhảy khi đứng đất, hoặc nhảy đôi nếu có skill"""
 
     def start(self, player):
-        # chỉ cho jump khi đang đứng đất
-        if player.on_ground:
+        if player.on_ground or (player.skills.has("double_jump") and player.jump_count < 2):
             player.vel_y = player.jump_force
-            player.jump_count = 1
-        self.done = True
+            player.jump_count += 1
+            player.on_ground = False
 
     def update(self, player):
         # jump là instant → xong ngay
-        return self.done
+        return True
 
 
 # ================= WAIT =================
+@register_command("wait")
 class WaitCommand(BaseCommand):
-    def __init__(self, time_sec):
+    """Đứng yên `time_sec` giây (tính theo tick mô phỏng)"""
+
+    def reset(self, time_sec):
         self.timer = max(0.0, float(time_sec))
 
     def start(self, player):
         player.vel_x = 0
 
     def update(self, player):
-        self.timer -= 1 / 60  # assume 60 FPS
+        # update() được gọi đúng 1 lần mỗi tick mô phỏng
+        self.timer -= SIM_DT
         return self.timer <= 0
+
+
+# ==================================================
+# POOL
+# ==================================================
+class CommandPool:
+    """Tái sử dụng object lệnh theo tên"""
+
+    def __init__(self):
+        self._free = {}
+
+    def acquire(self, name, args=()):
+        free = self._free.get(name)
+        if free:
+            command = free.pop()
+        else:
+            cls = COMMAND_TYPES.get(name)
+            if cls is None:
+                raise KeyError(f"Không có lệnh '{name}'")
+            command = cls()
+        command.reset(*args)
+        return command
+
+    def release(self, command):
+        self._free.setdefault(command.name, []).append(command)
+
+
+# ==================================================
+# ENGINE
+# ==================================================
+class CommandEngine:
+    """
+    Đường dispatch duy nhất: yêu cầu (tên, tham số) -> lệnh từ pool -> start/update trên player.
+    Ưu tiên hàng đợi, sau đó tới chương trình (CodeVM).
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or CommandPool()
+        self.queue = deque()     # yêu cầu (tên, tham số) chờ chạy
+        self.program = None      # nguồn yêu cầu có next_command() / finished / error
+        self.current = None      # lệnh đang chạy
+        self.error = None        # lỗi của chương trình vừa dừng
+        self.recorder = None     # ReplayRecorder (gameplay/replay.py) nếu đang ghi replay
+
+    def enqueue(self, name, *args):
+        if name not in COMMAND_TYPES:
+            raise KeyError(f"Không có lệnh '{name}'")
+        self.queue.append((name, args))
+        if self.recorder:
+            self.recorder.on_enqueue(name, args)
+
+    def load(self, program):
+        self.program = program
+        self.error = None
+        if self.recorder:
+            self.recorder.on_load()
+
+    def reset(self):
+        if self.recorder:
+            self.recorder.on_reset(self.program is not None)
+        if self.current is not None:
+            self.pool.release(self.current)
+        self.current = None
+        self.queue.clear()
+        self.program = None
+        self.error = None
+
+    def _next_request(self):
+        if self.queue:
+            return self.queue.popleft()
+        if self.program is not None:
+            request = self.program.next_command()
+            if self.recorder:
+                self.recorder.on_pull(request, self.program.finished)
+            if request is None and self.program.finished:
+                self.error = self.program.error
+                self.program = None
+            return request
+        return None
+
+    def dispatch(self, player, name, args=()):
+        """Bắt đầu lệnh `name` ngay (bỏ lệnh đang chạy nếu có)"""
+        if self.current is not None:
+            self.pool.release(self.current)
+        self.current = self.pool.acquire(name, args)
+        self.current.start(player)
+
+    def update(self, player):
+        """Chạy 1 tick; trả về False khi không còn lệnh nào (hết hàng đợi và chương trình)"""
+        if self.current is None:
+            request = self._next_request()
+            if request is not None:
+                self.dispatch(player, *request)
+            elif self.program is not None:
+                # VM chạy hết lượt của tick này mà chưa ra lệnh -> chờ tick sau
+                player.vel_x = 0
+                return True
+            else:
+                player.vel_x = 0
+                return False
+
+        # Gọi update của lệnh. Nếu lệnh trả về True nghĩa là đã xong.
+        if self.current.update(player):
+            self.pool.release(self.current)
+            self.current = None
+            player.vel_x = 0 # Dừng lại một chút giữa các lệnh cho an toàn
+        return True
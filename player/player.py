@@ -1,7 +1,9 @@
 import os
 import pygame
-from player.animation import Animation
 from player.skills import Skills
+from player.commands import CommandEngine
+from gameplay.asset_cache import load_animation
+from level.collision_grid import CollisionGrid
 
 class Player:
     SIZE = 32
@@ -19,10 +21,12 @@ class Player:
     DISAPPEAR = "disappear"
     APPEAR = "appear"
 
-    def __init__(self, x, y, character="Virtual Guy"):
+    def __init__(self, x, y, character="Virtual Guy", headless=False):
         # ===== CHARACTER =====
         self.character = character
         self.base_path = f"assets/Main Characters/{self.character}"
+        self.headless = headless  # True -> không load sprite, không cần màn hình
+        self.check_focus = not headless  # bỏ qua phím khi cửa sổ mất focus (replay tắt đi)
 
         # ===== RECT (HITBOX) =====
         self.rect = pygame.Rect(x, y, self.SIZE, self.SIZE)
@@ -80,18 +84,22 @@ class Player:
         self.invincible = False
         self.invincible_timer = 0
         self.invincible_time = 30
+        self.deaths = 0               # số lần chết (trúng đòn -> respawn), dùng cho thống kê / chấm bài
         self.skills = Skills()
         self.facing_right = True
 
         # ===== CODE CONTROL FLAGS (QUAN TRỌNG) =====
         self.code_active = False   # True khi đang chạy code
-        self.command_queue = []    # Hàng đợi lệnh (Queue)
-        self.current_command = None # Lệnh đang thực thi hiện tại
+        self.command_engine = CommandEngine() # Hàng đợi / chương trình + lệnh đang chạy
+        self.code_error = None     # Lỗi lúc chạy / vượt budget của chương trình vừa dừng
 
     def _load_anim(self, name, speed, loop=True, size=None):
-        sheet = pygame.image.load(os.path.join(self.base_path, name)).convert_alpha()
         if size is None: size = self.SIZE
-        return Animation(sheet, size, size, speed, loop)
+        # Frame dùng chung qua asset cache; headless chỉ giữ số frame
+        return load_animation(
+            os.path.join(self.base_path, name), size, size, speed, loop,
+            headless=self.headless
+        )
 
     # ==================================================
     # INPUT HANDLING
@@ -101,8 +109,8 @@ class Player:
         if self.code_active:
             return
 
-        # 2. Kiểm tra focus cửa sổ
-        if not pygame.key.get_focused():
+        # 2. Kiểm tra focus cửa sổ (headless không có cửa sổ để focus)
+        if self.check_focus and not pygame.key.get_focused():
             self.vel_x = 0
             return
 
@@ -192,6 +200,7 @@ class Player:
         if self.drop_timer > 0: self.drop_timer -= 1
 
         self._apply_gravity()
+        tiles, one_way = self._nearby(tiles, one_way)
         self._move_x(tiles)
         self._move_y(tiles, one_way)
 
@@ -202,44 +211,36 @@ class Player:
     # ==================================================
     # CODE EXECUTION LOGIC (QUAN TRỌNG NHẤT)
     # ==================================================
-    def enqueue_command(self, command):
-        """Thêm lệnh vào hàng đợi và bật chế độ Code"""
-        self.command_queue.append(command)
+    def enqueue_command(self, name, *args):
+        """Thêm lệnh (theo tên trong registry) vào hàng đợi và bật chế độ Code"""
+        self.command_engine.enqueue(name, *args)
         self.code_active = True
         
         # Reset các trạng thái vận động để tránh trôi
         self.vel_x = 0
         self.dash_timer = 0
 
+    def load_program(self, program):
+        """Chạy chương trình đã dịch (CodeVM): lệnh được lấy ra từng cái trong _handle_code_control"""
+        self.command_engine.load(program)
+        self.code_active = True
+
+        self.vel_x = 0
+        self.dash_timer = 0
+
     def reset_code_state(self):
         """Hủy bỏ mọi lệnh đang chạy (Dùng khi Reset hoặc Stop)"""
-        self.command_queue.clear()
-        self.current_command = None
+        self.command_engine.reset()
+        self.code_error = None
         self.code_active = False
         self.vel_x = 0
 
     def _handle_code_control(self):
-        # Trường hợp 1: Chưa có lệnh nào đang chạy
-        if not self.current_command:
-            if self.command_queue:
-                # Lấy lệnh tiếp theo từ hàng đợi
-                self.current_command = self.command_queue.pop(0)
-                # Kích hoạt lệnh (Start)
-                self.current_command.start(self)
-            else:
-                # Hết lệnh trong hàng đợi -> Tắt chế độ Code
-                self.code_active = False
-                self.vel_x = 0
-                return
-
-        # Trường hợp 2: Đang có lệnh chạy
-        if self.current_command:
-            # Gọi update của lệnh. Nếu lệnh trả về True nghĩa là đã xong.
-            is_finished = self.current_command.update(self)
-            
-            if is_finished:
-                self.current_command = None
-                self.vel_x = 0 # Dừng lại một chút giữa các lệnh cho an toàn
+        # CommandEngine lấy lệnh tiếp theo (hàng đợi -> chương trình), start/update lệnh hiện tại
+        if not self.command_engine.update(self):
+            # Hết lệnh -> Tắt chế độ Code
+            self.code_active = False
+            self.code_error = self.command_engine.error
 
     # ==================================================
     # PHYSICS Helpers
@@ -256,6 +257,21 @@ class Player:
             
         if self.dash_timer > 0: self.dash_timer -= 1
 
+    def _nearby(self, tiles, one_way):
+        """
+        Nếu có lưới chỉ mục: chỉ lấy các rect nằm trong vùng quét của frame này
+        (hitbox nới thêm đúng bằng vận tốc 2 trục) thay vì toàn bộ map.
+        """
+        if not isinstance(tiles, CollisionGrid):
+            return tiles, one_way
+        if tiles.linear and one_way.linear:
+            return tiles.rects, one_way.rects
+
+        dx = int(abs(self.vel_x)) + 1
+        dy = int(abs(self.vel_y)) + 1
+        area = self.rect.inflate(dx * 2, dy * 2)
+        return tiles.query(area), one_way.query(area)
+
     def _move_x(self, tiles):
         self.rect.x += self.vel_x
         self.on_wall = False
@@ -338,6 +354,7 @@ class Player:
         if self.invincible or self.state in (self.HIT, self.DISAPPEAR, self.APPEAR): return
         self.invincible = True
         self.invincible_timer = self.invincible_time
+        self.deaths += 1
         self.control_lock = True
         self.vel_x = 0; self.vel_y = 0
         self.state = self.HIT
@@ -368,9 +385,15 @@ class Player:
     def on_stomp(self):
         self.vel_y = -4; self.jump_count = 1; self.is_double_jumping = False
 
-    def draw(self, surf):
-        if self.invincible and pygame.time.get_ticks() % 200 < 100: return
+    def get_sprite(self):
+        """(frame, lật ngang, rect) đang hiển thị; None khi đang nhấp nháy bất tử"""
+        if self.invincible and pygame.time.get_ticks() % 200 < 100: return None
         img = self.current_anim.get_image()
-        if not self.facing_right: img = pygame.transform.flip(img, True, False)
-        img_rect = img.get_rect(center=self.rect.center)
+        return img, not self.facing_right, img.get_rect(center=self.rect.center)
+
+    def draw(self, surf):
+        sprite = self.get_sprite()
+        if sprite is None: return
+        img, flip, img_rect = sprite
+        if flip: img = pygame.transform.flip(img, True, False)
         surf.blit(img, img_rect)
\ No newline at end of file
@@ -1,10 +1,144 @@
 import pygame
+from bisect import bisect_right
+from collections import deque
+
+
+def _advance(pos, text):
+    """Vị trí (dòng, cột) ngay sau khi viết text bắt đầu từ pos"""
+    line, col = pos
+    n = text.count('\n')
+    if n == 0:
+        return line, col + len(text)
+    return line + n, len(text) - text.rfind('\n') - 1
+
+
+class EditHistory:
+    """
+    Undo/redo bằng delta (start, text bị xóa, text được chèn), không chụp lại cả self.lines.
+    Gõ / xóa liên tiếp được gộp thành 1 bước; vượt giới hạn thì bỏ bước cũ nhất.
+    """
+    MAX_STEPS = 500
+    MAX_CHARS = 200_000   # tổng số ký tự lưu trong các delta
+
+    def __init__(self):
+        self.undo_stack = deque()   # mỗi bước: list delta [start, removed, inserted]
+        self.redo_stack = []
+        self.chars = 0
+        self._group = None          # bước đang gom (begin/end)
+        self._group_depth = 0
+        self._sealed = True         # True -> lần sửa tiếp theo không được gộp vào bước trước
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.chars = 0
+        self._sealed = True
+
+    def seal(self):
+        """Ngắt chuỗi gộp (di chuyển con trỏ, undo/redo...)"""
+        self._sealed = True
+
+    def begin(self):
+        """Các lần sửa tới end() thành 1 bước undo (vd: gõ đè lên vùng bôi đen)"""
+        self._group_depth += 1
+
+    def end(self):
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            self._group = None
+
+    def record(self, start, removed, inserted):
+        self.redo_stack.clear()
+        delta = [start, removed, inserted]
+        size = len(removed) + len(inserted)
+
+        if self._group_depth:
+            if self._group is None:
+                self._group = [delta]
+                self._push(self._group, size)
+            else:
+                self._group.append(delta)
+                self._add_chars(size)
+            self._sealed = True
+            return
+
+        if not self._sealed and self._merge(delta):
+            self._add_chars(size)
+            return
+        self._push([delta], size)
+        # Chỉ gõ / xóa từng ký tự mới được gộp tiếp
+        self._sealed = size != 1 or '\n' in removed + inserted
+
+    def _merge(self, delta):
+        if len(delta[1]) + len(delta[2]) != 1 or '\n' in delta[1] + delta[2]:
+            return False
+        top = self.undo_stack[-1]
+        if len(top) != 1:
+            return False
+        prev = top[0]
+        start, removed, inserted = delta
+
+        # Gõ tiếp ngay sau đoạn vừa gõ
+        if inserted and not prev[1] and _advance(prev[0], prev[2]) == start:
+            prev[2] += inserted
+            return True
+        if removed and not prev[2]:
+            # Backspace liên tiếp
+            if _advance(start, removed) == prev[0]:
+                prev[0] = start
+                prev[1] = removed + prev[1]
+                return True
+            # Delete liên tiếp
+            if start == prev[0]:
+                prev[1] += removed
+                return True
+        return False
+
+    def _push(self, step, size):
+        self.undo_stack.append(step)
+        self._add_chars(size)
+
+    def _add_chars(self, size):
+        self.chars += size
+        # Bỏ bước cũ nhất khi vượt giới hạn (luôn giữ bước mới nhất)
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.MAX_STEPS or self.chars > self.MAX_CHARS):
+            self.chars -= self._step_chars(self.undo_stack.popleft())
+
+    @staticmethod
+    def _step_chars(step):
+        return sum(len(removed) + len(inserted) for _, removed, inserted in step)
+
+    def pop_undo(self):
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self.chars -= self._step_chars(step)
+        self.redo_stack.append(step)
+        self._sealed = True
+        return step
+
+    def pop_redo(self):
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        self.undo_stack.append(step)
+        self._add_chars(self._step_chars(step))
+        self._sealed = True
+        return step
+
 
 class CodeEditor:
+    # Văn bản lưu dạng mảng dòng; MỌI thao tác sửa đi qua replace() (1 lần splice list),
+    # nên dán 300 dòng chỉ là 1 phép gán slice thay vì chèn từng dòng.
     def __init__(self, font, line_height):
         self.font = font
         self.line_h = line_height
         self.lines = [""]
+        # Độ rộng tích lũy theo pixel của từng dòng: [(text, [0, w(c0), w(c0c1), ...])] theo chỉ số dòng.
+        # replace() splice mảng này cùng lúc với self.lines -> các dòng không bị sửa giữ nguyên cache.
+        self._widths = [None]
+        self.history = EditHistory()
+        self.version = 0   # tăng mỗi lần text đổi (CodePanel dùng để biết khi nào cần kiểm tra lại code)
         self.cursor_line = 0
         self.cursor_col = 0
         self.scroll = 0
@@ -18,10 +152,80 @@ class CodeEditor:
     def set_lines(self, lines):
         """Hàm tiện ích để reset nội dung code"""
         self.lines = lines if lines else [""]
+        self._widths = [None] * len(self.lines)
+        self.history.clear()
+        self.version += 1
         self.cursor_line = 0
         self.cursor_col = 0
         self.clear_selection()
 
+    # ==========================================
+    # BỘ ĐỆM VĂN BẢN
+    # ==========================================
+    def get_text(self, start, end):
+        """Văn bản trong đoạn [start, end)"""
+        s_line, s_col = start
+        e_line, e_col = end
+        if s_line == e_line:
+            return self.lines[s_line][s_col:e_col]
+        return '\n'.join([self.lines[s_line][s_col:], *self.lines[s_line + 1:e_line], self.lines[e_line][:e_col]])
+
+    def replace(self, start, end, text, record=True):
+        """
+        Primitive sửa văn bản duy nhất: thay đoạn [start, end) bằng text (start/end: (dòng, cột), start <= end).
+        Trả về vị trí (dòng, cột) ngay sau đoạn vừa chèn. record=False: không ghi vào lịch sử undo.
+        """
+        s_line, s_col = start
+        e_line, e_col = end
+        if record:
+            self.history.record(start, self.get_text(start, end), text)
+
+        new_lines = text.split('\n')
+        new_lines[0] = self.lines[s_line][:s_col] + new_lines[0]
+        end_pos = (s_line + len(new_lines) - 1, len(new_lines[-1]))
+        new_lines[-1] += self.lines[e_line][e_col:]
+
+        self.lines[s_line:e_line + 1] = new_lines
+        self._widths[s_line:e_line + 1] = [None] * len(new_lines)
+        self.version += 1
+        return end_pos
+
+    # ==========================================
+    # ĐO ĐỘ RỘNG (PIXEL)
+    # ==========================================
+    def prefix_widths(self, line_idx):
+        """[0, w(c0), w(c0c1), ...]: độ rộng pixel của mọi tiền tố của dòng (tính 1 lần, cache tới khi dòng đổi)"""
+        line = self.lines[line_idx]
+        if len(self._widths) != len(self.lines):
+            # self.lines bị gán / sửa trực tiếp từ ngoài -> bỏ cache
+            self._widths = [None] * len(self.lines)
+
+        entry = self._widths[line_idx]
+        if entry is None or entry[0] != line:
+            widths = [0]
+            total = 0
+            for ch, m in zip(line, self.font.metrics(line)):
+                # m[4]: bước tiến của glyph; None nếu font không có glyph này
+                total += m[4] if m else self.font.size(ch)[0]
+                widths.append(total)
+            entry = self._widths[line_idx] = (line, widths)
+        return entry[1]
+
+    def x_of(self, line_idx, col):
+        """Độ rộng pixel của line[:col]"""
+        return self.prefix_widths(line_idx)[col]
+
+    def col_at_x(self, line_idx, x):
+        """Cột gần vị trí x (pixel, tính từ đầu dòng) nhất: tìm nhị phân trên độ rộng tích lũy"""
+        widths = self.prefix_widths(line_idx)
+        if x <= 0:
+            return 0
+        if x >= widths[-1]:
+            return len(widths) - 1
+        i = bisect_right(widths, x) - 1   # x nằm trong ký tự i
+        # Qua nửa ký tự thì con trỏ nhảy sang sau ký tự đó
+        return i + 1 if x * 2 >= widths[i] + widths[i + 1] else i
+
     # ==========================================
     # LOGIC BÔI ĐEN (SELECTION)
     # ==========================================
@@ -56,25 +260,10 @@ class CodeEditor:
             return
 
         start, end = self.get_selection_range()
-        s_line, s_col = start
-        e_line, e_col = end
+        self.replace(start, end, "")
 
-        # 1. Lấy phần đầu của dòng bắt đầu (giữ lại)
-        prefix = self.lines[s_line][:s_col]
-        # 2. Lấy phần đuôi của dòng kết thúc (giữ lại)
-        suffix = self.lines[e_line][e_col:]
-        
-        # 3. Ghép lại
-        self.lines[s_line] = prefix + suffix
-        
-        # 4. Xóa các dòng nằm giữa (nếu chọn nhiều dòng)
-        if s_line != e_line:
-            # Xóa từ dòng s_line + 1 đến e_line
-            del self.lines[s_line + 1 : e_line + 1]
-
-        # 5. Cập nhật con trỏ về vị trí bắt đầu xóa
-        self.cursor_line = s_line
-        self.cursor_col = s_col
+        # Cập nhật con trỏ về vị trí bắt đầu xóa
+        self.cursor_line, self.cursor_col = start
         self.clear_selection()
 
     # ==========================================
@@ -82,42 +271,61 @@ class CodeEditor:
     # ==========================================
     def insert_text(self, text):
         """Chèn văn bản tại con trỏ (xử lý cả tab và nhiều dòng)"""
-        # Nếu đang bôi đen -> Xóa trước khi nhập
-        if self.has_selection():
+        # Nếu đang bôi đen -> Xóa trước khi nhập (xóa + chèn = 1 bước undo)
+        replacing = self.has_selection()
+        if replacing:
+            self.history.begin()
             self.remove_selection()
 
-        lines_to_insert = text.split('\n')
-        
-        # Lấy dòng hiện tại
+        # Con trỏ nằm sau dòng cuối -> thêm dòng trống
         if self.cursor_line >= len(self.lines):
-            self.lines.append("")
-            
-        current_line_text = self.lines[self.cursor_line]
-        prefix = current_line_text[:self.cursor_col]
-        suffix = current_line_text[self.cursor_col:]
-
-        if len(lines_to_insert) == 1:
-            # Trường hợp 1: Chèn trên cùng 1 dòng
-            new_text = lines_to_insert[0]
-            self.lines[self.cursor_line] = prefix + new_text + suffix
-            self.cursor_col += len(new_text)
-        else:
-            # Trường hợp 2: Chèn nhiều dòng (Paste code từ ngoài vào)
-            self.lines[self.cursor_line] = prefix + lines_to_insert[0]
-            
-            # Chèn các dòng giữa
-            for i in range(1, len(lines_to_insert) - 1):
-                self.lines.insert(self.cursor_line + i, lines_to_insert[i])
-            
-            # Xử lý dòng cuối cùng của phần chèn
-            last_idx = len(lines_to_insert) - 1
-            self.lines.insert(self.cursor_line + last_idx, lines_to_insert[-1] + suffix)
-            
-            # Cập nhật vị trí con trỏ
-            self.cursor_line += last_idx
-            self.cursor_col = len(lines_to_insert[-1])
+            self.replace((len(self.lines) - 1, len(self.lines[-1])),
+                         (len(self.lines) - 1, len(self.lines[-1])), "\n")
+
+        # Chèn 1 dòng hay dán nhiều dòng đều là 1 lần replace
+        pos = (self.cursor_line, self.cursor_col)
+        self.cursor_line, self.cursor_col = self.replace(pos, pos, text)
+
+        if replacing:
+            self.history.end()
+
+    # ==========================================
+    # UNDO / REDO
+    # ==========================================
+    def undo(self):
+        step = self.history.pop_undo()
+        if step is None:
+            return
+        # Áp dụng ngược các delta, từ cuối lên đầu
+        for start, removed, inserted in reversed(step):
+            self.replace(start, _advance(start, inserted), removed, record=False)
+        start, removed, _ = step[0]
+        self.cursor_line, self.cursor_col = _advance(start, removed)
+        self.clear_selection()
+
+    def redo(self):
+        step = self.history.pop_redo()
+        if step is None:
+            return
+        for start, removed, inserted in step:
+            self.replace(start, _advance(start, removed), inserted, record=False)
+        start, _, inserted = step[-1]
+        self.cursor_line, self.cursor_col = _advance(start, inserted)
+        self.clear_selection()
 
     def handle_key(self, event):
+        # 0. Undo (Ctrl + Z) / Redo (Ctrl + Y hoặc Ctrl + Shift + Z)
+        if event.mod & pygame.KMOD_CTRL:
+            if event.key == pygame.K_z:
+                if event.mod & pygame.KMOD_SHIFT:
+                    self.redo()
+                else:
+                    self.undo()
+                return
+            if event.key == pygame.K_y:
+                self.redo()
+                return
+
         # 1. Xử lý Select All (Ctrl + A)
         if event.key == pygame.K_a and (event.mod & pygame.KMOD_CTRL):
             self.sel_start = (0, 0)
@@ -137,23 +345,13 @@ class CodeEditor:
             if self.has_selection():
                 self.remove_selection()
             else:
-                # Delete: Di chuyển sang phải 1 bước rồi backspace
-                if self.cursor_col < len(self.lines[self.cursor_line]) or self.cursor_line < len(self.lines) - 1:
-                    self._move_cursor(1, 0)
-                    self._backspace_single()
+                self._delete_single()
             return
 
         # 4. Xử lý Enter
         if event.key == pygame.K_RETURN:
-            if self.has_selection():
-                self.remove_selection()
-            current = self.lines[self.cursor_line]
             # Cắt phần sau con trỏ xuống dòng mới
-            self.lines.insert(self.cursor_line + 1, current[self.cursor_col:])
-            # Giữ phần đầu ở dòng cũ
-            self.lines[self.cursor_line] = current[:self.cursor_col]
-            self.cursor_line += 1
-            self.cursor_col = 0
+            self.insert_text("\n")
             return
 
         # 5. Xử lý Tab (Chèn 4 spaces)
@@ -191,23 +389,32 @@ class CodeEditor:
 
     def _backspace_single(self):
         """Xóa 1 ký tự bên trái con trỏ"""
+        end = (self.cursor_line, self.cursor_col)
         if self.cursor_col > 0:
             # Xóa trên cùng dòng
-            line = self.lines[self.cursor_line]
-            self.lines[self.cursor_line] = line[:self.cursor_col - 1] + line[self.cursor_col:]
-            self.cursor_col -= 1
+            start = (self.cursor_line, self.cursor_col - 1)
         elif self.cursor_line > 0:
-            # Xóa dòng (nối dòng hiện tại vào cuối dòng trước)
-            prev_line = self.lines[self.cursor_line - 1]
-            current_line = self.lines[self.cursor_line]
-            
-            self.lines[self.cursor_line - 1] = prev_line + current_line
-            self.cursor_col = len(prev_line) # Con trỏ nằm ở chỗ nối
-            self.lines.pop(self.cursor_line) # Xóa dòng dư
-            self.cursor_line -= 1
+            # Xóa dòng (nối dòng hiện tại vào cuối dòng trước, con trỏ nằm ở chỗ nối)
+            start = (self.cursor_line - 1, len(self.lines[self.cursor_line - 1]))
+        else:
+            return
+        self.replace(start, end, "")
+        self.cursor_line, self.cursor_col = start
+
+    def _delete_single(self):
+        """Xóa 1 ký tự bên phải con trỏ (cuối dòng -> nối dòng dưới lên)"""
+        start = (self.cursor_line, self.cursor_col)
+        if self.cursor_col < len(self.lines[self.cursor_line]):
+            end = (self.cursor_line, self.cursor_col + 1)
+        elif self.cursor_line < len(self.lines) - 1:
+            end = (self.cursor_line + 1, 0)
+        else:
+            return
+        self.replace(start, end, "")
 
     def _move_cursor(self, dx, dy):
         """Hàm phụ trợ di chuyển con trỏ an toàn"""
+        self.history.seal()
         self.cursor_line += dy
         
         # Kẹp dòng trong giới hạn
@@ -1,8 +1,9 @@
 import pygame
 import json
 import os
-from ui.ui_text import UITextLayout
+from ui.ui_text import WRAP_CACHE, UITextLayout, wrap_words_simple
 from ui.code_editor import CodeEditor
+from ui.code_syntax import TOKEN_COLORS, CodeChecker, SyntaxHighlighter
 
 # === COLOR PALETTE ===
 COLOR_BG = (25, 27, 35)
@@ -10,6 +11,8 @@ COLOR_BTN_DEFAULT = (60, 65, 80)
 COLOR_TEXT_MAIN = (230, 230, 240)
 COLOR_ACCENT = (80, 200, 255)
 COLOR_SELECTION = (60, 100, 150) 
+COLOR_ERROR = (255, 110, 110)
+COLOR_LINE_NUM = (100, 100, 100)
 
 class CommandBtn:
     def __init__(self, text, code_snippet, color):
@@ -34,6 +37,9 @@ class CommandBtn:
         surface.blit(txt_surf, (tx, ty))
 
 class CodePanel:
+    # Tốc độ xem code chạy: số tick mô phỏng mỗi frame; None = chạy tới kết quả ngay rồi mới vẽ
+    SPEED_MODES = (("1x", 1), ("4x", 4), ("16x", 16), ("INSTANT", None))
+
     def __init__(self, x_pos, width, height, config_path="data/levels_config.json"):
         self.width = width
         self.height = height 
@@ -80,11 +86,15 @@ class CodePanel:
             CommandBtn("JUMP UP", "jump()", (180, 80, 80)),
             CommandBtn("LOOP 3x", "for i in range(3):", (200, 140, 40)),
             CommandBtn("INDENT (TAB)", "    ", (100, 100, 110)), 
+            CommandBtn("WAIT 1s", "wait(1)", (120, 90, 170)),
         ]
 
         # --- RECTS & ASSETS ---
         self.run_btn_rect = pygame.Rect(0, 0, 160, 50)
         self.hint_btn_rect = pygame.Rect(0, 0, 40, 40)
+        self.speed_btn_rect = pygame.Rect(0, 0, 96, 50)
+        self.speed_index = 0
+        self.status_msg = ""   # lỗi của lần chạy code gần nhất (cú pháp, quá dài...)
         self.editor_rect_cache = pygame.Rect(0,0,0,0)
         
         self.cmd_label_y = 160 
@@ -92,6 +102,17 @@ class CodePanel:
         self.icon_run = self._make_run_button_img((160, 50))
         self.lbl_hint = self.ui_font.render("?", True, COLOR_ACCENT)
 
+        # --- RENDER CACHE (editor) ---
+        # Surface đã render của từng dòng: [(text, surface)] theo chỉ số dòng, chỉ render lại khi text dòng đó đổi
+        self._line_surfs = []
+        # Số dòng: ghép từ atlas chữ số 0-9 render sẵn, không render lại mỗi frame
+        self._digit_atlas, self._digit_glyphs = self._make_digit_atlas()
+
+        # --- SYNTAX ---
+        self.highlighter = SyntaxHighlighter()
+        self.checker = CodeChecker()     # dịch thử ở thread nền -> đánh dấu dòng lỗi trên gutter
+        self._submitted_version = -1
+
         # --- STATE ---
         self.cursor_timer = 0
         self.cursor_visible = True
@@ -112,21 +133,24 @@ class CodePanel:
         s.blit(txt, ((size[0]-txt.get_width())//2, (size[1]-txt.get_height())//2))
         return s
 
+    def _make_digit_atlas(self):
+        """Atlas chữ số 0-9 + vùng cắt / bước tiến của từng chữ số (font dự phòng có thể không monospace)"""
+        digits = [self.code_font.render(d, True, COLOR_LINE_NUM) for d in "0123456789"]
+        advances = [m[4] for m in self.code_font.metrics("0123456789")]
+        h = self.code_font.get_height()
+        atlas = pygame.Surface((sum(d.get_width() for d in digits), h), pygame.SRCALPHA)
+
+        glyphs = []
+        x = 0
+        for d, adv in zip(digits, advances):
+            atlas.blit(d, (x, 0))
+            glyphs.append((pygame.Rect(x, 0, d.get_width(), h), adv))
+            x += d.get_width()
+        return atlas, glyphs
+
     def _calc_text_height(self, text, font, max_width):
-        words = text.split(' ')
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            w, h = font.size(test_line)
-            if w < max_width:
-                current_line.append(word)
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-        lines.append(' '.join(current_line))
-        
+        # Ngắt dòng lấy từ WRAP_CACHE: load level tính 1 lần, draw() dùng lại
+        lines = WRAP_CACHE.lines(text, font, max_width, wrap_words_simple)
         line_height = font.get_height() + 4
         return len(lines) * line_height
 
@@ -160,7 +184,8 @@ class CodePanel:
         rows = (len(self.commands) + cols - 1) // cols
         buttons_bottom = start_y_buttons + rows * (btn_h + 15)
         
-        self.run_btn_rect.midbottom = (self.width // 2, self.height - 25)
+        self.run_btn_rect.bottomleft = (padding, self.height - 25)
+        self.speed_btn_rect.bottomright = (self.width - padding, self.height - 25)
         
         y_editor = buttons_bottom + 20
         footer_h = 90
@@ -184,6 +209,7 @@ class CodePanel:
         str_id = str(level_id)
         
         # Reset editor state (scroll, cursor) nhưng KHÔNG reset text
+        self.clear_status()
         self.editor.clear_selection()
         self.editor.scroll = 0
         self.editor.cursor_line = 0
@@ -232,12 +258,43 @@ class CodePanel:
 
         self.recalculate_layout()
 
+    # ================= SPEED (TURBO) =================
+    @property
+    def ticks_per_frame(self):
+        return self.SPEED_MODES[self.speed_index][1] or 1
+
+    @property
+    def instant(self):
+        return self.SPEED_MODES[self.speed_index][1] is None
+
+    def cycle_speed(self):
+        self.speed_index = (self.speed_index + 1) % len(self.SPEED_MODES)
+
+    # ================= STATUS =================
+    def show_status(self, msg):
+        self.status_msg = msg
+
+    def clear_status(self):
+        self.status_msg = ""
+
+    def syntax_error(self):
+        """(số dòng hoặc None, thông báo) nếu code hiện tại dịch lỗi; None nếu hợp lệ hoặc chưa kiểm tra xong"""
+        version, error = self.checker.result
+        if version != self.editor.version or self.control_mode == "keyboard":
+            return None
+        return error
+
     def update(self, dt):
         self.cursor_timer += dt
         if self.cursor_timer >= 0.5:
             self.cursor_visible = not self.cursor_visible
             self.cursor_timer = 0
 
+        # Code vừa đổi -> gửi bản mới cho thread kiểm tra
+        if self.control_mode != "keyboard" and self._submitted_version != self.editor.version:
+            self._submitted_version = self.editor.version
+            self.checker.submit(self.editor.version, "\n".join(self.editor.lines))
+
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
             mx, my = event.pos
@@ -249,12 +306,19 @@ class CodePanel:
             
             # Run Button - Vẫn trả về lines từ editor để Main xử lý
             if self.run_btn_rect.collidepoint(local_x, local_y):
-                return [l for l in self.editor.lines if l.strip()]
+                self.clear_status()
+                # Giữ cả dòng trống để số dòng trong thông báo lỗi khớp với editor
+                return list(self.editor.lines)
 
             if self.hint_btn_rect.collidepoint(local_x, local_y):
                 self.show_hint = not self.show_hint
                 return None
 
+            # Nút tốc độ: main.py không coi click này là "quay lại soạn code"
+            if self.control_mode != "keyboard" and self.speed_btn_rect.collidepoint(local_x, local_y):
+                self.cycle_speed()
+                return "SPEED"
+
             # Logic chặn click khi ở chế độ Keyboard
             if self.control_mode != "keyboard":
                 for cmd in self.commands:
@@ -308,37 +372,12 @@ class CodePanel:
         if line_idx < 0: line_idx = 0
         if line_idx >= len(self.editor.lines): line_idx = len(self.editor.lines) - 1
         
-        line_text = self.editor.lines[line_idx]
-        rel_x = local_x - text_x
-        if rel_x < 0: return line_idx, 0
-        
-        cum_w = 0
-        for i, char in enumerate(line_text):
-            cw = self.code_font.size(char)[0]
-            if cum_w + cw / 2 > rel_x:
-                return line_idx, i
-            cum_w += cw
-        return line_idx, len(line_text)
+        return line_idx, self.editor.col_at_x(line_idx, local_x - text_x)
 
     def _draw_wrapped_text(self, surface, text, x, y, max_width, font, color):
-        words = text.split(' ')
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            w, h = font.size(test_line)
-            if w < max_width:
-                current_line.append(word)
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-        lines.append(' '.join(current_line))
-        
         current_y = y
         line_height = font.get_height() + 4
-        for line in lines:
-            txt_surf = font.render(line, True, color)
+        for txt_surf in WRAP_CACHE.surfaces(text, font, max_width, color, wrap_words_simple):
             surface.blit(txt_surf, (x, current_y))
             current_y += line_height
         
@@ -390,14 +429,78 @@ class CodePanel:
         pygame.draw.rect(self.surface, (20, 22, 28), self.editor_rect_cache)
         pygame.draw.rect(self.surface, (60, 65, 80), self.editor_rect_cache, 2)
         
-        self._draw_editor_text(self.editor_rect_cache)
+        error = self.syntax_error()
+        self._draw_editor_text(self.editor_rect_cache, error)
+        if self.status_msg:
+            self._draw_status(self.editor_rect_cache, self.status_msg)
+        elif error:
+            lineno, msg = error
+            self._draw_status(self.editor_rect_cache, f"{msg} (dòng {lineno})" if lineno else msg)
         
         if self.control_mode != "keyboard":
             self.surface.blit(self.icon_run, self.run_btn_rect)
+            self._draw_speed_button()
             
         screen.blit(self.surface, (self.x, 0))
 
-    def _draw_editor_text(self, rect):
+    def _draw_status(self, rect, text):
+        """Dải báo lỗi ở đáy editor"""
+        max_w = rect.width - 12
+        if self.small_font.size(text)[0] > max_w:
+            while text and self.small_font.size(text + "...")[0] > max_w:
+                text = text[:-1]
+            text += "..."
+
+        bar_h = self.small_font.get_height() + 8
+        bar = pygame.Rect(rect.x + 2, rect.bottom - bar_h - 2, rect.width - 4, bar_h)
+        pygame.draw.rect(self.surface, (70, 30, 35), bar)
+        lbl = self.small_font.render(text, True, COLOR_ERROR)
+        self.surface.blit(lbl, (bar.x + 4, bar.centery - lbl.get_height() // 2))
+
+    def _draw_speed_button(self):
+        rect = self.speed_btn_rect
+        pygame.draw.rect(self.surface, (60, 60, 70), rect, border_radius=10)
+        pygame.draw.rect(self.surface, COLOR_ACCENT, rect, 2, border_radius=10)
+
+        cap = self.small_font.render("SPEED", True, (150, 150, 150))
+        lbl = self.small_font.render(self.SPEED_MODES[self.speed_index][0], True, COLOR_ACCENT)
+        # Font pixel có nhiều khoảng trống trên/dưới -> canh theo tâm thay vì mép
+        self.surface.blit(cap, cap.get_rect(center=(rect.centerx, rect.y + rect.h * 3 // 10)))
+        self.surface.blit(lbl, lbl.get_rect(center=(rect.centerx, rect.y + rect.h * 7 // 10)))
+
+    def _line_surface(self, i, line):
+        """Surface của dòng i đã tô màu cú pháp (lấy từ cache nếu text dòng không đổi)"""
+        cache = self._line_surfs
+        if i >= len(cache):
+            cache.extend([None] * (i + 1 - len(cache)))
+
+        entry = cache[i]
+        if entry is None or entry[0] != line:
+            entry = cache[i] = (line, self._render_line(i, line))
+        return entry[1]
+
+    def _render_line(self, i, line):
+        spans = self.highlighter.spans(i, line)
+        if len(spans) <= 1:
+            color = TOKEN_COLORS[spans[0][2]] if spans else COLOR_TEXT_MAIN
+            return self.code_font.render(line, True, color)
+
+        # Mỗi token 1 màu, đặt theo độ rộng tích lũy của editor (cùng số đo với con trỏ / bôi đen)
+        surf = pygame.Surface((self.editor.x_of(i, len(line)) + 2, self.code_font.get_height()), pygame.SRCALPHA)
+        for start, end, kind in spans:
+            part = self.code_font.render(line[start:end], True, TOKEN_COLORS[kind])
+            surf.blit(part, (self.editor.x_of(i, start), 0))
+        return surf
+
+    def _draw_line_number(self, num, right_x, y):
+        """Vẽ số dòng canh phải tại right_x bằng atlas chữ số"""
+        glyphs = [self._digit_glyphs[int(ch)] for ch in str(num)]
+        x = right_x - sum(adv for _, adv in glyphs)
+        for area, adv in glyphs:
+            self.surface.blit(self._digit_atlas, (x, y), area)
+            x += adv
+
+    def _draw_editor_text(self, rect, error=None):
         old_clip = self.surface.get_clip()
         self.surface.set_clip(rect)
         
@@ -413,6 +516,10 @@ class CodePanel:
         pygame.draw.line(self.surface, (60, 60, 60), (rect.x + gutter_w, rect.y), (rect.x + gutter_w, rect.y + rect.height))
         
         sel_range = self.editor.get_selection_range()
+        # Bỏ cache của các dòng đã bị xóa
+        del self._line_surfs[len(self.editor.lines):]
+        self.highlighter.trim(len(self.editor.lines))
+        error_line = error[0] - 1 if error and error[0] else None
 
         for i in range(start_line, end_line):
             line = self.editor.lines[i]
@@ -422,24 +529,21 @@ class CodePanel:
                 if s[0] <= i <= e[0]:
                     col_start = 0 if i > s[0] else s[1]
                     col_end = len(line) if i < e[0] else e[1]
-                    px_start = self.code_font.size(line[:col_start])[0]
-                    px_w = self.code_font.size(line[col_start:col_end])[0]
+                    px_start = self.editor.x_of(i, col_start)
+                    px_w = self.editor.x_of(i, col_end) - px_start
                     if px_w == 0 and i < e[0]: px_w = 10 
                     highlight_rect = pygame.Rect(text_x + px_start, ty, px_w, self.line_h)
                     pygame.draw.rect(self.surface, COLOR_SELECTION, highlight_rect)
 
-            num_s = self.code_font.render(str(i+1), True, (100, 100, 100))
-            self.surface.blit(num_s, (rect.x + gutter_w - num_s.get_width() - 5, ty))
-            
-            color = COLOR_TEXT_MAIN
-            if line.strip().startswith("#"):
-                color = (100, 150, 100) 
-            
-            code_s = self.code_font.render(line, True, color)
-            self.surface.blit(code_s, (text_x, ty))
+            if i == error_line:
+                # Đánh dấu dòng lỗi cú pháp trên gutter
+                pygame.draw.rect(self.surface, (90, 35, 40), (rect.x, ty, gutter_w, self.line_h))
+                pygame.draw.rect(self.surface, COLOR_ERROR, (rect.x, ty, 3, self.line_h))
+            self._draw_line_number(i + 1, rect.x + gutter_w - 5, ty)
+            self.surface.blit(self._line_surface(i, line), (text_x, ty))
             
             if i == self.editor.cursor_line and self.cursor_visible and self.control_mode != "keyboard":
-                w = self.code_font.size(line[:self.editor.cursor_col])[0]
+                w = self.editor.x_of(i, self.editor.cursor_col)
                 cx = text_x + w
                 pygame.draw.line(self.surface, (255, 255, 0), (cx, ty), (cx, ty + self.line_h), 2)
             
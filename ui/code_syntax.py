@@ -0,0 +1,142 @@
+# ui/code_syntax.py
+#
+# Hỗ trợ cú pháp cho editor của CodePanel:
+# - SyntaxHighlighter: tách token từng dòng (từ khóa, số, chuỗi, hàm API, comment), cache theo dòng,
+#   chỉ tách lại dòng có text đổi.
+# - CodeChecker: dịch thử code ở thread nền (cùng compile_program với nút RUN) để đánh dấu dòng lỗi
+#   trên gutter, không chặn việc gõ phím.
+
+import keyword
+import re
+import threading
+import time
+
+from gameplay.code_vm import CodeBudgetError, compile_program
+from gameplay.student_code import STUDENT_API
+
+# Loại token -> màu
+TOKEN_COLORS = {
+    "text": (230, 230, 240),
+    "keyword": (200, 120, 220),
+    "builtin": (90, 200, 200),
+    "api": (100, 190, 255),
+    "number": (240, 180, 100),
+    "string": (210, 150, 110),
+    "comment": (100, 150, 100),
+}
+
+BUILTINS = {"range", "True", "False", "None"}
+
+# Từng dòng độc lập (code học viên không có chuỗi nhiều dòng)
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>\#.*)
+  | (?P<string>(?:[rRbBuUfF]{1,2})?(?:'(?:\\.|[^'\\])*'?|"(?:\\.|[^"\\])*"?))
+  | (?P<number>\b(?:0[xX][0-9a-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+|\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)\b)
+  | (?P<name>[^\W\d]\w*)
+""", re.VERBOSE)
+
+
+def tokenize_line(line):
+    """[(cột bắt đầu, cột kết thúc, loại)] phủ kín cả dòng"""
+    spans = []
+    pos = 0
+    for m in _TOKEN_RE.finditer(line):
+        kind = m.lastgroup
+        if kind == "name":
+            word = m.group()
+            if word in STUDENT_API:
+                kind = "api"
+            elif word in BUILTINS:
+                kind = "builtin"
+            elif keyword.iskeyword(word):
+                kind = "keyword"
+            else:
+                continue   # tên biến: để chung với phần text thường
+
+        if m.start() > pos:
+            spans.append((pos, m.start(), "text"))
+        spans.append((m.start(), m.end(), kind))
+        pos = m.end()
+
+    if pos < len(line):
+        spans.append((pos, len(line), "text"))
+    return spans
+
+
+class SyntaxHighlighter:
+    """Cache token theo chỉ số dòng: [(text, spans)], tách lại khi text dòng đổi"""
+
+    def __init__(self):
+        self._spans = []
+
+    def spans(self, i, line):
+        cache = self._spans
+        if i >= len(cache):
+            cache.extend([None] * (i + 1 - len(cache)))
+
+        entry = cache[i]
+        if entry is None or entry[0] != line:
+            entry = cache[i] = (line, tokenize_line(line))
+        return entry[1]
+
+    def trim(self, line_count):
+        """Bỏ cache của các dòng đã bị xóa"""
+        del self._spans[line_count:]
+
+
+class CodeChecker:
+    """
+    Dịch thử code ở thread nền. submit() chỉ ghi lại bản code mới nhất; thread đợi CHECK_DELAY giây
+    không có thay đổi rồi mới dịch (đang gõ dở 1 từ thì chưa báo lỗi).
+    Kết quả: self.result = (version đã kiểm tra, lỗi), lỗi = (số dòng hoặc None, thông báo) hoặc None.
+    """
+    CHECK_DELAY = 0.3
+
+    def __init__(self, api=STUDENT_API):
+        self.api = api
+        self.result = (-1, None)
+
+        self._cond = threading.Condition()
+        self._pending = None        # (version, source) chờ dịch
+        self._last_submit = 0.0
+        self._thread = None
+
+    def submit(self, version, source):
+        with self._cond:
+            self._pending = (version, source)
+            self._last_submit = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="CodeChecker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._last_submit + self.CHECK_DELAY - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                version, source = self._pending
+                self._pending = None
+
+            # Gán 1 lần (atomic) -> thread vẽ đọc không cần khóa
+            self.result = (version, self.check(source))
+
+    def check(self, source):
+        """(số dòng lỗi hoặc None, thông báo) hoặc None nếu dịch được"""
+        try:
+            compile_program(source, self.api)
+        except CodeBudgetError as e:
+            return None, str(e)
+        except SyntaxError as e:
+            # gồm cả CodeCompileError (cú pháp Python hợp lệ nhưng game không hỗ trợ)
+            return e.lineno, e.msg
+        except (ValueError, RecursionError, MemoryError) as e:
+            # ast.parse: ký tự NUL, code lồng quá sâu...
+            return None, str(e)
+        return None
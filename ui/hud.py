@@ -1,5 +1,6 @@
 import os
 import pygame
+from gameplay.asset_cache import load_frames, load_image
 
 class HUD:
     BASE_H = 720
@@ -9,7 +10,7 @@ class HUD:
         self.item_manager = item_manager
         self.count_font = pygame.font.Font(self.FONT_PATH, 16)
         self.icons = self._load_icons()
-        self.setting_icon = pygame.image.load("assets/Menu/Buttons/Settings.png").convert_alpha()
+        self.setting_icon = load_image("assets/Menu/Buttons/Settings.png")
         self.setting_rect = None
         self.sound_on = True
         self.opened = False
@@ -17,12 +18,20 @@ class HUD:
         self.speed = 5.0
         self.btn_size = 48
         self.gap = 12
-        self.icon_home = pygame.image.load("assets/Menu/Buttons/Home.png").convert_alpha()
-        self.icon_levels = pygame.image.load("assets/Menu/Buttons/Levels.png").convert_alpha()
-        self.icon_restart = pygame.image.load("assets/Menu/Buttons/Restart.png").convert_alpha()
-        self.icon_volume = pygame.image.load("assets/Menu/Buttons/Volume.png").convert_alpha()
-        self.icon_unvolume = pygame.image.load("assets/Menu/Buttons/Unvolume.png").convert_alpha()
+        self.icon_home = load_image("assets/Menu/Buttons/Home.png")
+        self.icon_levels = load_image("assets/Menu/Buttons/Levels.png")
+        self.icon_restart = load_image("assets/Menu/Buttons/Restart.png")
+        self.icon_volume = load_image("assets/Menu/Buttons/Volume.png")
+        self.icon_unvolume = load_image("assets/Menu/Buttons/Unvolume.png")
         self.btn_rects = {}
+        self.drawn_rect = None   # vùng màn hình HUD vừa vẽ (dùng cho dirty-rect)
+        self.settings_drawn_rect = None   # vùng nút setting + các nút đang trượt ra (dùng cho dirty-rect)
+
+        # --- CACHE ---
+        self._scaled_cache = {}       # (ảnh gốc, size) -> ảnh đã scale; xóa khi scale màn hình đổi
+        self._cache_scale = None
+        self._inventory_key = None    # (version của ItemManager, kích thước màn hình, right_margin)
+        self._inventory_blits = []    # [(surface, vị trí)] số + icon đã render / scale sẵn
 
     def _load_icons(self):
         base = "assets/Items/Fruits"
@@ -33,8 +42,7 @@ class HUD:
         for name in self.item_manager.count:
             path = os.path.join(base, f"{name}.png")
             if os.path.exists(path):
-                sheet = pygame.image.load(path).convert_alpha()
-                icons[name] = sheet.subsurface((0, 0, 32, 32))
+                icons[name] = load_frames(path, 32, 32)[0]
         return icons
 
     def _scale(self, surf):
@@ -66,64 +74,84 @@ class HUD:
         else:
             self.panel_t = max(0.0, self.panel_t - self.speed * dt)
 
+    def _scaled(self, image, size):
+        """Ảnh đã scale về size x size (cache theo scale màn hình hiện tại)"""
+        key = (image, size)
+        scaled = self._scaled_cache.get(key)
+        if scaled is None:
+            scaled = self._scaled_cache[key] = pygame.transform.scale(image, (size, size))
+        return scaled
+
     def _draw_inventory(self, surf, scale, right_margin):
-            sw, _ = surf.get_size()
-            icon_size = int(48 * scale)
-            
-            # Vị trí bắt đầu (từ phải sang trái)
-            start_x = sw - right_margin - int(60 * scale)
-            y = int(40 * scale) # Toạ độ Y phía trên cùng của hàng icon
-
-            items_to_draw = []
-            for name, icon in self.icons.items():
-                if self.item_manager.discovered.get(name):
-                    items_to_draw.append((name, icon))
-            
-            current_x = start_x
-
-            # Độ dày của viền đen (tùy chỉnh theo scale, tối thiểu 1 pixel)
-            outline_offset = max(1, int(2 * scale))
-
-            for name, icon in items_to_draw:
-                count = self.item_manager.count.get(name, 0)
-                
-                # --- XỬ LÝ TEXT ---
-                text_str = str(count)
-                # 1. Tạo text trắng (nội dung chính)
-                white_text = self.count_font.render(text_str, True, (255, 255, 255))
-                # 2. Tạo text đen (dùng làm viền)
-                black_text = self.count_font.render(text_str, True, (0, 0, 0))
-
-                # Scale kích thước text
-                target_w = int(white_text.get_width() * scale)
-                target_h = int(white_text.get_height() * scale)
-                white_text = pygame.transform.scale(white_text, (target_w, target_h))
-                black_text = pygame.transform.scale(black_text, (target_w, target_h))
-                
-                # Tính toán vị trí Text:
-                # Dùng 'midright' để căn điểm giữa bên phải của text
-                # Trục Y = y + icon_size // 2 (Chính giữa chiều cao của icon) -> Giúp chữ cao lên, cân đối hơn
-                text_rect = white_text.get_rect(midright=(current_x, y + icon_size // 2))
-                
-                # Vẽ viền đen (vẽ lệch sang 4 hướng)
-                surf.blit(black_text, (text_rect.x - outline_offset, text_rect.y))
-                surf.blit(black_text, (text_rect.x + outline_offset, text_rect.y))
-                surf.blit(black_text, (text_rect.x, text_rect.y - outline_offset))
-                surf.blit(black_text, (text_rect.x, text_rect.y + outline_offset))
-
-                # Vẽ text trắng đè lên trên
-                surf.blit(white_text, text_rect)
-                
-                # --- XỬ LÝ ICON ---
-                icon_scaled = pygame.transform.scale(icon, (icon_size, icon_size))
-                # Đặt icon bên trái của text
-                # Căn chỉnh icon sao cho nó nằm thẳng hàng với hàng y
-                icon_rect = icon_scaled.get_rect(topright=(text_rect.left - int(5*scale), y))
-                surf.blit(icon_scaled, icon_rect)
-
-                # Cập nhật vị trí X cho món đồ tiếp theo (dịch sang trái)
-                current_x = icon_rect.left - int(30 * scale)
-                
+        # Chỉ render lại khi số trái cây đổi (ItemManager.version) hoặc đổi kích thước màn hình
+        key = (self.item_manager.version, surf.get_size(), right_margin)
+        if key != self._inventory_key:
+            self._inventory_key = key
+            self._inventory_blits, self.drawn_rect = self._build_inventory(surf.get_width(), scale, right_margin)
+        surf.blits(self._inventory_blits, doreturn=False)
+
+    def _build_inventory(self, sw, scale, right_margin):
+        """Danh sách blit của hàng trái cây + vùng bao quanh (drawn_rect)"""
+        icon_size = int(48 * scale)
+
+        # Vị trí bắt đầu (từ phải sang trái)
+        start_x = sw - right_margin - int(60 * scale)
+        y = int(40 * scale) # Toạ độ Y phía trên cùng của hàng icon
+
+        items_to_draw = []
+        for name, icon in self.icons.items():
+            if self.item_manager.discovered.get(name):
+                items_to_draw.append((name, icon))
+
+        current_x = start_x
+        blits = []
+        drawn = []
+
+        # Độ dày của viền đen (tùy chỉnh theo scale, tối thiểu 1 pixel)
+        outline_offset = max(1, int(2 * scale))
+
+        for name, icon in items_to_draw:
+            count = self.item_manager.count.get(name, 0)
+
+            # --- XỬ LÝ TEXT ---
+            text_str = str(count)
+            # 1. Tạo text trắng (nội dung chính)
+            white_text = self.count_font.render(text_str, True, (255, 255, 255))
+            # 2. Tạo text đen (dùng làm viền)
+            black_text = self.count_font.render(text_str, True, (0, 0, 0))
+
+            # Scale kích thước text
+            target_w = int(white_text.get_width() * scale)
+            target_h = int(white_text.get_height() * scale)
+            white_text = pygame.transform.scale(white_text, (target_w, target_h))
+            black_text = pygame.transform.scale(black_text, (target_w, target_h))
+
+            # Tính toán vị trí Text:
+            # Dùng 'midright' để căn điểm giữa bên phải của text
+            # Trục Y = y + icon_size // 2 (Chính giữa chiều cao của icon) -> Giúp chữ cao lên, cân đối hơn
+            text_rect = white_text.get_rect(midright=(current_x, y + icon_size // 2))
+
+            # Viền đen (lệch sang 4 hướng), text trắng đè lên trên
+            blits.append((black_text, (text_rect.x - outline_offset, text_rect.y)))
+            blits.append((black_text, (text_rect.x + outline_offset, text_rect.y)))
+            blits.append((black_text, (text_rect.x, text_rect.y - outline_offset)))
+            blits.append((black_text, (text_rect.x, text_rect.y + outline_offset)))
+            blits.append((white_text, text_rect.topleft))
+            drawn.append(text_rect.inflate(outline_offset * 2, outline_offset * 2))
+
+            # --- XỬ LÝ ICON ---
+            icon_scaled = self._scaled(icon, icon_size)
+            # Đặt icon bên trái của text
+            # Căn chỉnh icon sao cho nó nằm thẳng hàng với hàng y
+            icon_rect = icon_scaled.get_rect(topright=(text_rect.left - int(5*scale), y))
+            blits.append((icon_scaled, icon_rect.topleft))
+            drawn.append(icon_rect)
+
+            # Cập nhật vị trí X cho món đồ tiếp theo (dịch sang trái)
+            current_x = icon_rect.left - int(30 * scale)
+
+        return blits, (drawn[0].unionall(drawn) if drawn else None)
+
     def _draw_settings(self, surf, scale):
         sw, sh = surf.get_size()
         size = int(self.btn_size * scale)
@@ -132,9 +160,10 @@ class HUD:
         gx = int(16 * scale)
         gy = sh - size - int(16 * scale)
 
-        gear = pygame.transform.scale(self.setting_icon, (size, size))
+        gear = self._scaled(self.setting_icon, size)
         surf.blit(gear, (gx, gy))
         self.setting_rect = pygame.Rect(gx, gy, size, size)
+        self.settings_drawn_rect = self.setting_rect.copy()
 
         if self.panel_t <= 0:
             self.btn_rects.clear()
@@ -156,14 +185,19 @@ class HUD:
             x_target = gx + size + extra_gap + i * (size + gap)
             x = x_origin + (x_target - x_origin) * self.panel_t
 
-            img = pygame.transform.scale(icon, (size, size))
+            img = self._scaled(icon, size)
             rect = pygame.Rect(int(x), y, size, size)
 
             surf.blit(img, rect)
             self.btn_rects[name] = rect
+            self.settings_drawn_rect.union_ip(rect)
 
     def draw(self, surf, dt, right_margin=0):
         scale = self._scale(surf)
+        if scale != self._cache_scale:
+            # Đổi kích thước cửa sổ -> ảnh đã scale cũ không dùng được nữa
+            self._cache_scale = scale
+            self._scaled_cache.clear()
         self.update(dt)
         self._draw_inventory(surf, scale, right_margin)
         self._draw_settings(surf, scale)
\ No newline at end of file
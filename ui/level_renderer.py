@@ -0,0 +1,148 @@
+import pygame
+
+
+def _scale_edge(value, dst, src):
+    """Pixel đích đầu tiên lấy mẫu từ pixel nguồn `value` khi scale src -> dst (nearest)"""
+    return -((-value * dst) // src)
+
+
+def _merge_rects(rects):
+    """Gộp các rect chồng nhau để display.update ít vùng hơn"""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class DirtyLevelRenderer:
+    """
+    Vẽ khu vực game theo dirty-rect (dùng khi đang soạn code, thế giới gần như đứng yên).
+    - Lớp tĩnh (background + map) được scale và ghép 1 lần vào `static`.
+    - Mỗi frame chỉ những sprite đổi frame / vị trí mới được vẽ lại (rect cũ + rect mới).
+    - Overlay (HUD, Mission) được khôi phục nền ở vùng frame trước rồi vẽ lại.
+    Trả về danh sách rect cho pygame.display.update thay cho flip toàn màn hình.
+    """
+
+    BG_COLOR = (20, 20, 25)
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        """Buộc frame sau vẽ lại toàn bộ (đổi level, resize, vừa vẽ kiểu thường...)"""
+        self._key = None
+        self.static = None
+        self.view = None
+        self._sprites = []          # [(frame, lật, x, y, w, h)] của frame trước (toạ độ view)
+        self._scaled = {}           # (frame, lật, w, h) -> Surface đã scale
+        self._overlay_rects = []    # vùng overlay frame trước (toạ độ màn hình)
+
+    # ================= DRAW =================
+    def draw(self, screen, level, game_rect, view_rect, alpha=1.0):
+        """
+        Cập nhật khu vực game trên `screen`.
+        game_rect: vùng dành cho game (bên trái code panel); view_rect: nơi đặt world đã scale.
+        alpha: hệ số nội suy giữa 2 tick mô phỏng. Trả về các rect màn hình đã thay đổi.
+        """
+        key = (screen.get_size(), tuple(game_rect), tuple(view_rect),
+               level.map_surface, level.bg, int(level.bg.offset_y) if level.bg else 0)
+
+        if key != self._key:
+            self._rebuild(level, game_rect, view_rect)
+            self._key = key
+
+            self._sprites = self._collect(level, game_rect, view_rect, alpha)
+            for sprite in self._sprites:
+                self._blit_sprite(sprite)
+
+            screen.blit(self.view, game_rect)
+            self._overlay_rects = []
+            return [screen.get_rect()]
+
+        sprites = self._collect(level, game_rect, view_rect, alpha)
+        changed = set(self._sprites).symmetric_difference(sprites)
+        self._sprites = sprites
+
+        view_bounds = self.view.get_rect()
+        dirty = []
+        for _, _, x, y, w, h in changed:
+            rect = pygame.Rect(x, y, w, h).clip(view_bounds)
+            if rect.w and rect.h:
+                dirty.append(rect)
+        dirty = _merge_rects(dirty)
+
+        for rect in dirty:
+            self.view.blit(self.static, rect, rect)
+            self.view.set_clip(rect)
+            for sprite in sprites:
+                if rect.colliderect(sprite[2:]):
+                    self._blit_sprite(sprite)
+            self.view.set_clip(None)
+
+        # Vùng sprite đổi + vùng overlay frame trước (xoá HUD/Mission cũ trước khi vẽ lại)
+        offset = game_rect.topleft
+        updated = [rect.move(offset) for rect in dirty]
+        for rect in self._overlay_rects:
+            local = rect.move(-offset[0], -offset[1]).clip(view_bounds)
+            if local.w and local.h:
+                updated.append(local.move(offset))
+
+        for rect in updated:
+            screen.blit(self.view, rect, rect.move(-offset[0], -offset[1]))
+        return updated
+
+    def end_frame(self, overlay_rects):
+        """Ghi nhận vùng overlay vừa vẽ lên trên game; trả về để đưa vào display.update"""
+        self._overlay_rects = [pygame.Rect(r) for r in overlay_rects if r]
+        return list(self._overlay_rects)
+
+    # ================= INTERNAL =================
+    def _rebuild(self, level, game_rect, view_rect):
+        world = pygame.Surface((level.map_w, level.map_h)).convert()
+        world.fill(self.BG_COLOR)
+        level.draw_static(world)
+
+        self.static = pygame.Surface(game_rect.size).convert()
+        self.static.fill(self.BG_COLOR)
+        self.static.blit(
+            pygame.transform.scale(world, view_rect.size),
+            (view_rect.x - game_rect.x, view_rect.y - game_rect.y)
+        )
+        self.view = self.static.copy()
+        self._scaled.clear()
+
+    def _collect(self, level, game_rect, view_rect, alpha):
+        """Sprite của level đổi sang toạ độ view, khớp với khi scale cả world"""
+        map_w, map_h = level.map_w, level.map_h
+        ox = view_rect.x - game_rect.x
+        oy = view_rect.y - game_rect.y
+
+        sprites = []
+        for frame, flip, rect in level.get_sprites(alpha):
+            if frame is None:
+                continue
+            left = _scale_edge(rect.left, view_rect.w, map_w)
+            top = _scale_edge(rect.top, view_rect.h, map_h)
+            right = _scale_edge(rect.right, view_rect.w, map_w)
+            bottom = _scale_edge(rect.bottom, view_rect.h, map_h)
+            if right > left and bottom > top:
+                sprites.append((frame, flip, ox + left, oy + top, right - left, bottom - top))
+        return sprites
+
+    def _blit_sprite(self, sprite):
+        frame, flip, x, y, w, h = sprite
+        key = (frame, flip, w, h)
+        image = self._scaled.get(key)
+        if image is None:
+            image = pygame.transform.flip(frame, True, False) if flip else frame
+            image = pygame.transform.scale(image, (w, h))
+            self._scaled[key] = image
+        self.view.blit(image, (x, y))
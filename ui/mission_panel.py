@@ -1,4 +1,5 @@
 import pygame
+from gameplay.asset_cache import load_image
 
 class MissionPanel:
     BASE_H = 720
@@ -33,14 +34,15 @@ class MissionPanel:
         self.btn_size = 40
         # Rect sẽ được cập nhật liên tục
         self.btn_rect = pygame.Rect(0, 0, self.btn_size, self.btn_size)
+        self.drawn_rect = None   # vùng màn hình vừa vẽ (panel + nút), dùng cho dirty-rect
 
         try:
             self.btn_show = pygame.transform.scale(
-                pygame.image.load("assets/Menu/Buttons/Hide.png").convert_alpha(),
+                load_image("assets/Menu/Buttons/Hide.png"),
                 (self.btn_size, self.btn_size)
             )
             self.btn_hide = pygame.transform.scale(
-                pygame.image.load("assets/Menu/Buttons/Show.png").convert_alpha(),
+                load_image("assets/Menu/Buttons/Show.png"),
                 (self.btn_size, self.btn_size)
             )
         except:
@@ -123,6 +125,7 @@ class MissionPanel:
 
     def draw(self, screen):
         if not self.objective:
+            self.drawn_rect = None
             return
 
         objectives_data = getattr(self.objective, 'objectives', {})
@@ -177,4 +180,6 @@ class MissionPanel:
 
         # Vẽ Nút (sử dụng rect đã update)
         btn_img = self.btn_hide if self.opened else self.btn_show
-        screen.blit(btn_img, self.btn_rect)
\ No newline at end of file
+        screen.blit(btn_img, self.btn_rect)
+
+        self.drawn_rect = pygame.Rect(int(self.x), 0, self.width, self.height).union(self.btn_rect)
\ No newline at end of file
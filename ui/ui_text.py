@@ -1,38 +1,109 @@
 # ui/ui_text.py
 
+from collections import OrderedDict
+
+
+# ================= WRAP =================
+def wrap_words(font, text, max_width):
+    """Ngắt dòng theo từ (dòng rộng tối đa max_width), từ quá dài thì cắt theo ký tự"""
+    words = text.split(" ")
+    lines = []
+    current = ""
+
+    for word in words:
+        test = word if not current else current + " " + word
+        if font.size(test)[0] <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+                current = word
+            else:
+                # fallback: từ quá dài
+                cut = ""
+                for ch in word:
+                    if font.size(cut + ch)[0] <= max_width:
+                        cut += ch
+                    else:
+                        lines.append(cut)
+                        cut = ch
+                current = cut
+
+    if current:
+        lines.append(current)
+
+    return lines
+
+
+def wrap_words_simple(font, text, max_width):
+    """Cách ngắt dòng của CodePanel (hướng dẫn level): dòng phải hẹp hơn max_width, không cắt từ dài"""
+    words = text.split(' ')
+    lines = []
+    current_line = []
+
+    for word in words:
+        test_line = ' '.join(current_line + [word])
+        w, h = font.size(test_line)
+        if w < max_width:
+            current_line.append(word)
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+    lines.append(' '.join(current_line))
+
+    return lines
+
+
+class WrapCache:
+    """
+    LRU kết quả ngắt dòng (text, font, max_width, cách ngắt) và surface đã render (+ màu).
+    Hướng dẫn / gợi ý level chỉ phải đo và render 1 lần, các frame sau chỉ còn blit.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def _get(self, key, build):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        entry = build()
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def lines(self, text, font, max_width, wrap=wrap_words):
+        return self._get((text, font, max_width, wrap), lambda: tuple(wrap(font, text, max_width)))
+
+    def surfaces(self, text, font, max_width, color, wrap=wrap_words):
+        return self._get(
+            (text, font, max_width, wrap, tuple(color)),
+            lambda: tuple(font.render(line, True, color) for line in self.lines(text, font, max_width, wrap))
+        )
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Dùng chung cho mọi panel
+WRAP_CACHE = WrapCache()
+
+
 class UITextLayout:
-    def __init__(self, font, line_height=18):
+    def __init__(self, font, line_height=18, cache=WRAP_CACHE):
         self.font = font
         self.line_height = line_height
+        self.cache = cache
 
     def wrap_words(self, text, max_width):
-        words = text.split(" ")
-        lines = []
-        current = ""
-
-        for word in words:
-            test = word if not current else current + " " + word
-            if self.font.size(test)[0] <= max_width:
-                current = test
-            else:
-                if current:
-                    lines.append(current)
-                    current = word
-                else:
-                    # fallback: từ quá dài
-                    cut = ""
-                    for ch in word:
-                        if self.font.size(cut + ch)[0] <= max_width:
-                            cut += ch
-                        else:
-                            lines.append(cut)
-                            cut = ch
-                    current = cut
-
-        if current:
-            lines.append(current)
-
-        return lines
+        return list(self.cache.lines(text, self.font, max_width))
 
     def calc_block_height(self, paragraphs, max_width, has_title=False):
         lines = 0
@@ -40,19 +111,14 @@ class UITextLayout:
             lines += 1
 
         for p in paragraphs:
-            wrapped = self.wrap_words(p, max_width)
-            lines += len(wrapped) + 1
+            lines += len(self.cache.lines(p, self.font, max_width)) + 1
 
         return 16 + lines * self.line_height + 8
 
     def draw_paragraphs(self, surface, paragraphs, x, y, max_width, color):
         for p in paragraphs:
-            lines = self.wrap_words(p, max_width)
-            for line in lines:
-                surface.blit(
-                    self.font.render(line, True, color),
-                    (x, y)
-                )
+            for line_surf in self.cache.surfaces(p, self.font, max_width, color):
+                surface.blit(line_surf, (x, y))
                 y += self.line_height
             y += 6
         return y